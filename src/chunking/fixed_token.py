@@ -21,6 +21,8 @@ def fixed_token_chunk(text: str, doc_id: str, config: dict, model_name: str, pro
         for i in range(0, len(all_token_ids), max_tokens)
     ]
     
+    # Every chunk id shares the document prefix; build it once
+    id_prefix = f"{os.path.splitext(doc_id)[0]}_ft_"
     char_start = 0
     for idx, token_id_list in enumerate(id_chunks):
         # Decode based on provider
@@ -30,8 +32,7 @@ def fixed_token_chunk(text: str, doc_id: str, config: dict, model_name: str, pro
             chunk_text = tokenizer.decode(token_id_list)
             
         char_end = char_start + len(chunk_text)
-        doc = os.path.splitext(doc_id)[0]
-        chunk_id = f"{doc}_ft_{idx + 1}"
+        chunk_id = id_prefix + str(idx + 1)
         
         chunks.append({
             "chunk_id": chunk_id,
@@ -1,15 +1,34 @@
 import spacy
 import os
-from ..tokenizer import get_token_counts
-nlp = spacy.load("en_core_web_sm")
+from functools import lru_cache
+from ..tokenizer import get_token_counts_batch
+
+@lru_cache(maxsize=None)
+def get_sentence_splitter(name: str):
+    """Load a spaCy pipeline that sets sentence boundaries, once per process.
+
+    "parser" uses en_core_web_sm's dependency parse (most accurate on messy
+    text); "sentencizer" is spaCy's rule-based punctuation splitter, which
+    needs no model download and is many times faster.
+    """
+    if name == "parser":
+        # Only the dependency parser is needed for sentence boundaries; skipping the
+        # tagger, lemmatizer and NER makes every doc considerably cheaper to process.
+        return spacy.load("en_core_web_sm", exclude=["tagger", "attribute_ruler", "lemmatizer", "ner"])
+    if name == "sentencizer":
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        return nlp
+    raise ValueError(f"Invalid sentence splitter: {name}")
 
 def sentence_aware_chunk(text: str, doc_id: str, config: dict, model_name: str, provider: str) -> list[dict]:
     max_tokens = config["sentence_max_tokens"]
+    nlp = get_sentence_splitter(config.get("sentence_splitter", "parser"))
 
-    # Split into sentences
+    # Split into sentences, counting each sentence's words once up front
     doc = nlp(text)
     sentence_objs = [
-        (sent.text, sent.start_char, sent.end_char)
+        (sent.text, sent.start_char, sent.end_char, len(sent.text.split()))
         for sent in doc.sents
     ]
 
@@ -17,13 +36,15 @@ def sentence_aware_chunk(text: str, doc_id: str, config: dict, model_name: str,
     buffer = []
     buffer_tokens = 0
     chunk_index = 0
+    id_prefix = f"{os.path.splitext(doc_id)[0]}_sa_"
 
-    for sent_text, start_c, end_c in sentence_objs:
+    for sent_text, start_c, end_c, sent_words in sentence_objs:
         # Estimate tokens (rough count)
-        sent_tokens = len(sent_text.split()) * 1.3  # Rough estimate
-        doc = os.path.splitext(doc_id)[0]
+        sent_tokens = sent_words * 1.3  # Rough estimate
         
-        if buffer and (buffer_tokens + sent_tokens > max_tokens):
+        # Most sentences just extend the buffer, so test the size first; the
+        # buffer can only be empty before the first sentence
+        if buffer_tokens + sent_tokens > max_tokens and buffer:
             # finalize current chunk
             chunk_index += 1
             first_text, first_start, _ = buffer[0]
@@ -31,15 +52,14 @@ def sentence_aware_chunk(text: str, doc_id: str, config: dict, model_name: str,
             chunk_text = " ".join([b[0] for b in buffer])
 
             chunks.append({
-                "chunk_id": f"{doc}_sa_{chunk_index}",
+                "chunk_id": id_prefix + str(chunk_index),
                 "text": chunk_text,
                 "char_start": first_start,
                 "char_end": last_end,
                 "strategy": "sentence_aware",
                 "source": doc_id,
                 "model": model_name,
-                "provider": provider,
-                "token_count": len(chunk_text.split())
+                "provider": provider
             })
 
             buffer = [(sent_text, start_c, end_c)]
@@ -56,15 +76,19 @@ def sentence_aware_chunk(text: str, doc_id: str, config: dict, model_name: str,
         chunk_text = " ".join([b[0] for b in buffer])
 
         chunks.append({
-            "chunk_id": f"{doc}_sa_{chunk_index}",
+            "chunk_id": id_prefix + str(chunk_index),
             "text": chunk_text,
             "char_start": first_start,
             "char_end": last_end,
             "strategy": "sentence_aware",
             "source": doc_id,
             "model": model_name,
-            "provider": provider,
-            "token_count": get_token_counts(chunk_text, provider, model_name)
+            "provider": provider
         })
 
+    # Count every chunk's tokens in one batched tokenizer call
+    token_counts = get_token_counts_batch([chunk["text"] for chunk in chunks], provider, model_name)
+    for chunk, token_count in zip(chunks, token_counts):
+        chunk["token_count"] = token_count
+
     return chunks
\ No newline at end of file
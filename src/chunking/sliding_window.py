@@ -30,6 +30,8 @@ def sliding_window_chunk(text: str, doc_id: str, config: dict, model_name: str,
         chunks_of_ids.append(all_token_ids[start_idx:end_idx])
         start_idx += stride
 
+    # Every chunk id shares the document prefix; build it once
+    id_prefix = f"{os.path.splitext(doc_id)[0]}_sw_"
     char_start = 0
     for idx, token_id_list in enumerate(chunks_of_ids):
         if provider == "openai":
@@ -38,8 +40,7 @@ def sliding_window_chunk(text: str, doc_id: str, config: dict, model_name: str,
             chunk_text = tokenizer.decode(token_id_list, skip_special_tokens=True)
             
         char_end = char_start + len(chunk_text)
-        doc = os.path.splitext(doc_id)[0]
-        chunk_id = f"{doc}_sw_{idx + 1}"
+        chunk_id = id_prefix + str(idx + 1)
         
         chunks.append({
             "chunk_id": chunk_id,
@@ -1,8 +1,48 @@
 #Loads and validates the YAML configuration (e.g., which chunking strategy to use, token sizes, overlap). 
 #Exposes those settings to the ingestion and chunking code.
 import yaml
+from functools import lru_cache
 
+# Prefer the libyaml-backed loader (~10x faster) and fall back to the pure-Python one
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def validate_config(config: dict) -> None:
+    """Validate the configuration parameters."""
+    required_fields = {
+        "fixed_chunk_size": int,
+        "overlap": int,
+        "sentence_max_tokens": int
+    }
+    
+    for field, field_type in required_fields.items():
+        if field not in config:
+            raise ValueError(f"Missing required config field: {field}")
+        if not isinstance(config[field], field_type):
+            raise ValueError(f"Invalid type for {field}. Expected {field_type}, got {type(config[field])}")
+    
+    if config["overlap"] >= config["fixed_chunk_size"]:
+        raise ValueError("Overlap must be smaller than chunk size")
+
+    ef_search = config.get("objectives", {}).get("ef_search")
+    if ef_search is not None and (not isinstance(ef_search, int) or ef_search <= 0):
+        raise ValueError(f"Invalid objectives.ef_search: {ef_search}. Expected a positive int")
+
+# Config files don't change during a run, so each one is parsed and validated
+# once per process; callers share the returned dict and must not mutate it.
+@lru_cache(maxsize=None)
 def load_config(config_path: str) -> dict:
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
-    
\ No newline at end of file
+        config = yaml.load(f, Loader=_SafeLoader)
+    validate_config(config)
+    return config
+
+    
+
+# Sensible concurrent-request ceilings per OpenAI usage tier
+USAGE_TIER_CONCURRENCY = {"free": 1, "tier1": 35, "tier2": 50, "tier3": 75, "tier4": 125, "tier5": 125}
+
+def get_embed_concurrency(config: dict) -> int:
+    """Concurrent embedding requests: ``embed_concurrency`` if set, else the usage tier's ceiling."""
+    if config.get("embed_concurrency"):
+        return config["embed_concurrency"]
+    return USAGE_TIER_CONCURRENCY.get(config.get("openai_usage_tier"), 16)
@@ -7,16 +7,17 @@ import matplotlib.pyplot as plt
 
 chunks_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'chunks'))
 
-chunk_names = [
-    fn for fn in os.listdir(chunks_dir) if fn.endswith(".json")
-]
+with os.scandir(chunks_dir) as entries:
+    chunk_names = [
+        entry.name for entry in entries if entry.name.endswith(".json") and entry.is_file()
+    ]
 
 all_chunks = []
 
 print ("Found file names: ")
 for fn in chunk_names:
     file_path = os.path.join(chunks_dir, fn)
-    with open(file_path, "r", encoding="utf-8") as f:
+    with open(file_path, "rb") as f:
         chunk_list = json.load(f)
     all_chunks.append(chunk_list)
 
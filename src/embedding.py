@@ -1,44 +1,96 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 class Embedder(ABC):
+    # Requests issued at once by embed_batch; subclasses set this from their constructor
+    concurrency = 1
+
     @abstractmethod
     def embed(self, text: str) -> list[float]:
         pass
 
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts; providers that accept batched input override this."""
+        return self._map_concurrently(self.embed, texts)
+
+    def _map_concurrently(self, fn, items: list) -> list:
+        # Results come back in input order whatever order requests finish in
+        if self.concurrency <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as executor:
+            return list(executor.map(fn, items))
+
 class OpenAIEmbedder(Embedder):
-    def __init__(self, model_name: str, openai_key: str):
+    def __init__(self, model_name: str, openai_key: str, concurrency: int = 1):
         try:
             import openai
         except ImportError:
             raise ImportError("OpenAI is not installed. Please install it with `pip3 install openai`.")
 
         openai.api_key = openai_key
+        # The SDK retries 429s with jittered backoff and honours Retry-After
+        openai.max_retries = 5
         self.client = openai
         self.model_name = model_name
+        self.concurrency = concurrency
     def embed(self, text: str) -> list[float]:
         response = self.client.embeddings.create(model=self.model_name, input=text)
         vector = response.data[0].embedding
         return vector
 
+    # The embeddings endpoint accepts at most 2048 inputs per request
+    MAX_BATCH_SIZE = 2048
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        # Requests of up to MAX_BATCH_SIZE inputs, up to ``concurrency`` in flight
+        slices = [texts[i:i + self.MAX_BATCH_SIZE] for i in range(0, len(texts), self.MAX_BATCH_SIZE)]
+        results = self._map_concurrently(self._embed_slice, slices)
+        return [vector for vectors in results for vector in vectors]
+
+    def _embed_slice(self, texts: list[str]) -> list[list[float]]:
+        response = self.client.embeddings.create(model=self.model_name, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
 class HFEmbedder(Embedder):
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, batch_size: int = 32, max_length: int = 512):
         try:
             from transformers import AutoTokenizer, AutoModel
             import torch
         except ImportError:
             raise ImportError("Please install transformers and torch: pip install transformers torch")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
         self.model = AutoModel.from_pretrained(model_name)
         self.model.eval()
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
+        self.batch_size = batch_size
+        self.max_length = max_length
 
     def embed(self, text: str) -> list[float]:
-        from transformers import AutoTokenizer
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts in forward passes of ``batch_size``.
+
+        Texts are grouped by length so each batch pads to similar lengths;
+        vectors are masked mean-pooled and L2-normalized, and returned in input order.
+        """
         import torch
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        embedding = outputs.last_hidden_state.mean(dim=1).squeeze().tolist()
-        return embedding
+        import torch.nn.functional as F
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                inputs = self.tokenizer([texts[i] for i in batch], return_tensors="pt", truncation=True,
+                                        max_length=self.max_length, padding=True).to(self.device)
+                outputs = self.model(**inputs)
+                # Mean over real tokens only, so padding doesn't change any text's vector
+                mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                summed = (outputs.last_hidden_state * mask).sum(dim=1)
+                pooled = F.normalize(summed / mask.sum(dim=1), dim=-1)
+                for i, vector in zip(batch, pooled.tolist()):
+                    vectors[i] = vector
+        return vectors
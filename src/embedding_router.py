@@ -4,12 +4,18 @@ import json
 import argparse
 from typing import List, Dict, Any
 import logging
+from logging.handlers import MemoryHandler
 from src.supabase_client import SupabaseClient
 import traceback
 import time
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from functools import lru_cache
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.embedding import OpenAIEmbedder, HFEmbedder
-from src.vectorStore import upsert_vector
+from src.vectorStore import upsert_vector, upsert_vectors_batch
 from src.config import load_config
 
 # Configure logging
@@ -18,7 +24,8 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler('embedding.log')
+        # Buffer file writes; they are flushed every 1000 records or on an error
+        MemoryHandler(1000, flushLevel=logging.ERROR, target=logging.FileHandler('embedding.log'))
     ]
 )
 logger = logging.getLogger(__name__)
@@ -31,23 +38,6 @@ except Exception as e:
     logger.error(f"Error loading API keys: {str(e)}")
     raise
 
-def validate_config(config: dict) -> None:
-    """Validate the configuration parameters."""
-    required_fields = {
-        "fixed_chunk_size": int,
-        "overlap": int,
-        "sentence_max_tokens": int
-    }
-    
-    for field, field_type in required_fields.items():
-        if field not in config:
-            raise ValueError(f"Missing required config field: {field}")
-        if not isinstance(config[field], field_type):
-            raise ValueError(f"Invalid type for {field}. Expected {field_type}, got {type(config[field])}")
-    
-    if config["overlap"] >= config["fixed_chunk_size"]:
-        raise ValueError("Overlap must be smaller than chunk size")
-
 def validate_document(doc_data: Dict[str, Any]) -> None:
     """Validate the document data structure."""
     required_fields = ["text", "source"]
@@ -158,14 +148,145 @@ def embed_huggingface(chunk, config):
         logger.error(f"Error in embed_huggingface: {str(e)}")
         raise
 
+def embed_batch(chunks, user_id):
+    """Generate embeddings for several chunks with one provider request per model."""
+    try:
+        by_provider = {}
+        for chunk in chunks:
+            by_provider.setdefault(chunk["provider"], []).append(chunk)
+        if "openai" in by_provider:
+            embed_openai_batch(by_provider["openai"], user_id)
+        if "huggingface" in by_provider:
+            embed_huggingface_batch(by_provider["huggingface"], user_id)
+    except Exception as e:
+        logger.error(f"Error in embed_batch function: {str(e)}")
+        raise
+
+# Repeated boilerplate (headers, footers, license text) is embedded once per
+# model and process; vectors are keyed on a digest of the text
+# Vectors are kept as float32 arrays: about 6 KB each for 1536 dimensions
+VECTOR_CACHE_SIZE = 10_000
+_vector_cache = OrderedDict()
+_vector_cache_lock = threading.Lock()
+
+def _embed_texts(embedder, model_name: str, texts: list[str]) -> list[list[float]]:
+    """Embed ``texts`` in order, calling the provider only for texts not seen before."""
+    keys = [(model_name, blake2b(text.encode("utf-8"), digest_size=16).digest()) for text in texts]
+    vectors = {}
+    with _vector_cache_lock:
+        for key in keys:
+            if key in _vector_cache:
+                _vector_cache.move_to_end(key)
+                vectors[key] = _vector_cache[key].tolist()
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+
+    if missing:
+        new_vectors = embedder.embed_batch(list(missing.values()))
+        with _vector_cache_lock:
+            for key, vector in zip(missing, new_vectors):
+                vectors[key] = vector
+                _vector_cache[key] = np.asarray(vector, dtype=np.float32)
+            while len(_vector_cache) > VECTOR_CACHE_SIZE:
+                _vector_cache.popitem(last=False)
+        logger.info(f"Embedded {len(missing)} unique texts for {len(texts)} chunks with {model_name}")
+
+    return [vectors[key] for key in keys]
+
+def embed_openai_batch(chunks, user_id):
+    """Generate embeddings for several chunks using OpenAI models."""
+    try:
+        config = load_config("config/default.yaml")
+        prices = {model["model"]: model["pricing_per_1k_tokens"] for model in config["openai"]}
+        collection_name = f"autoembed_chunks_{user_id}"
+
+        by_model = {}
+        for chunk in chunks:
+            by_model.setdefault(chunk["model"], []).append(chunk)
+
+        for model_name, model_chunks in by_model.items():
+            embedder = get_embedder("openai", model_name)
+            t0 = time.time()
+            vectors = _embed_texts(embedder, model_name, [chunk["text"] for chunk in model_chunks])
+            t1 = time.time()
+            # One request serves the whole batch; attribute its latency evenly
+            latency = (t1 - t0) * 1000 / len(model_chunks)
+            price = prices.get(model_name, 0)
+
+            payloads = []
+            for chunk in model_chunks:
+                token_count = chunk["token_count"]
+                payloads.append({
+                    "chunk_id": chunk["chunk_id"],
+                    "source": chunk["source"],
+                    "strategy": chunk["strategy"],
+                    "token_count": token_count,
+                    "latency": latency,
+                    "cost": token_count * price / 1000
+                })
+            upsert_vectors_batch(vectors, payloads, [chunk["chunk_id"] for chunk in model_chunks], collection_name)
+            logger.info(f"Successfully embedded {len(model_chunks)} chunks using OpenAI {model_name}")
+
+    except Exception as e:
+        logger.error(f"Error in embed_openai_batch: {str(e)}")
+        raise
+
+def embed_huggingface_batch(chunks, user_id):
+    """Generate embeddings for several chunks using HuggingFace models."""
+    try:
+        config = load_config("config/default.yaml")
+        collection_name = f"autoembed_chunks_{user_id}"
+        texts = [chunk["text"] for chunk in chunks]
+
+        for model in config["huggingface"]:
+            embedder = get_embedder("huggingface", model["model"])
+            t0 = time.time()
+            vectors = _embed_texts(embedder, model["model"], texts)
+            t1 = time.time()
+            latency = (t1 - t0) * 1000 / len(chunks)
+
+            payloads = [
+                {
+                    "chunk_id": chunk["chunk_id"],
+                    "source": chunk["source"],
+                    "strategy": chunk["strategy"],
+                    "user_id": user_id,
+                    "latency": latency,
+                    "cost": 0  # HuggingFace models are free
+                }
+                for chunk in chunks
+            ]
+            upsert_vectors_batch(vectors, payloads, [chunk["chunk_id"] for chunk in chunks], collection_name)
+            logger.info(f"Successfully embedded {len(chunks)} chunks using HuggingFace {model['model']}")
+
+    except Exception as e:
+        logger.error(f"Error in embed_huggingface_batch: {str(e)}")
+        raise
+
+_embedder_lock = threading.Lock()
+
 def get_embedder(provider: str, model_name: str, **kwargs):
-    """Get an embedder instance for the specified provider and model."""
+    """Get an embedder instance for the specified provider and model.
+
+    Instances are cached, so repeated calls reuse the same API client or
+    loaded model instead of rebuilding it for every batch. The lock keeps
+    concurrent cold calls from each loading their own copy of the model.
+    """
+    with _embedder_lock:
+        return _build_embedder(provider, model_name, **kwargs)
+
+@lru_cache(maxsize=4)
+def _build_embedder(provider: str, model_name: str, **kwargs):
+    """Construct the embedder behind ``get_embedder``."""
     try:
         provider = provider.lower()
         if provider == "openai":
             if not openai_key:
                 raise ValueError("OpenAI API key not found")
-            return OpenAIEmbedder(model_name, openai_key)
+            return OpenAIEmbedder(model_name, openai_key, **kwargs)
         elif provider in ("huggingface", "hf"):
             return HFEmbedder(model_name)
         else:
@@ -1,5 +1,6 @@
 import os
 import json
+from functools import lru_cache
 import sys
 import argparse
 from datetime import datetime
@@ -23,8 +24,9 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from src.embedding import OpenAIEmbedder, HFEmbedder
-from src.vectorStore import search
+from src.vectorStore import search_batch, RESULT_PAYLOAD_FIELDS
 
+@lru_cache(maxsize=1)
 def load_api_keys():
     try:
         with open("APIKeys.json", "r") as f:
@@ -34,23 +36,6 @@ def load_api_keys():
     except json.JSONDecodeError:
         raise ValueError("APIKeys.json is not valid JSON.")
 
-def validate_config(config: dict) -> None:
-    """Validate the configuration parameters."""
-    required_fields = {
-        "fixed_chunk_size": int,
-        "overlap": int,
-        "sentence_max_tokens": int
-    }
-    
-    for field, field_type in required_fields.items():
-        if field not in config:
-            raise ValueError(f"Missing required config field: {field}")
-        if not isinstance(config[field], field_type):
-            raise ValueError(f"Invalid type for {field}. Expected {field_type}, got {type(config[field])}")
-    
-    if config["overlap"] >= config["fixed_chunk_size"]:
-        raise ValueError("Overlap must be smaller than chunk size")
-
 def validate_document(doc_data: Dict[str, Any]) -> None:
     """Validate the document data structure."""
     required_fields = ["text", "source"]
@@ -120,11 +105,15 @@ def evaluate_retrieval(pairs: dict, user_id: str, provider: str, model: str, str
         # Get all QA pair files for the user
 
             
-        for pair in pairs:
+        # Embed all questions and query Qdrant in one batch each
+        collection_name = f"autoembed_chunks_{user_id}"
+        all_hits = []
+        if pairs:
+            query_vectors = embedder.embed_batch([pair["question"] for pair in pairs])
+            all_hits = search_batch(query_vectors, collection_name, top_k,
+                                    fields=RESULT_PAYLOAD_FIELDS + ("latency", "cost"))
 
-            query_vector = embedder.embed(pair["question"])
-            collection_name = f"autoembed_chunks_{user_id}"
-            hits = search(query_vector, collection_name, top_k)
+        for pair, hits in zip(pairs, all_hits):
             
             # Log the top 5 chunks and their scores
             logger.info(f"Top {len(hits)} chunks for question: {pair['question']}")
@@ -1,30 +1,33 @@
 import fitz
-import json
+import orjson
 import os
 from bs4 import BeautifulSoup
 from markdown import markdown
 import re
 import tempfile
-from src.supabase_client import SupabaseClient
+from src.supabase_client import SupabaseClient, get_supabase_client
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def ingest_file(file_path: str, user_id: str) -> str:
+def ingest_file(file_path: str, user_id: str) -> tuple[str, dict]:
     """
     Ingest a single file based on its extension and save the result to Supabase.
-    Returns the storage path of the processed JSON file.
+    Returns the storage path of the processed JSON file and the ingested document,
+    so callers can use the text without downloading it again.
     """
-    if file_path.endswith(".pdf"):
-        return ingest_pdf(file_path, user_id)
-    elif file_path.endswith(".md"):
-        return ingest_markdown(file_path, user_id)
-    elif file_path.endswith(".html"):
-        return ingest_html(file_path, user_id)
-    else:
+    original_file_path = os.path.basename(file_path)
+    file_type = file_path.rpartition('.')[2]
+    if file_type not in _TEXT_EXTRACTORS:
         raise ValueError(f"Unsupported file type: {file_path}")
+    data = {
+        "text": _TEXT_EXTRACTORS[file_type](file_path),
+        "source": original_file_path,
+        "file_type": file_type
+    }
+    return save_ingested_json(orjson.dumps(data), original_file_path, user_id), data
 
 
 def clean_text(text: str) -> str:
@@ -53,82 +56,94 @@ def html_to_text(file_path: str) -> str:
     return ''.join(BeautifulSoup(html_content, 'html.parser').find_all(text=True))
 
 
-def ingest_pdf(file_path: str, user_id: str, original_file_path: str) -> str:
+_TEXT_EXTRACTORS = {
+    "pdf": pdf_to_text,
+    "md": markdown_to_text,
+    "html": html_to_text,
+}
+
+
+def ingest_pdf(file_path: str, user_id: str, original_file_path: str, supabase: SupabaseClient = None) -> str:
     """
     Process a PDF file and save the result.
     Args:
         file_path: Path to the temporary file to process
         user_id: User ID for storage
         original_file_path: Original file path from Supabase
+        supabase: Client to upload with; reused across files when provided
     """
     data = {
         "text": pdf_to_text(file_path),
         "source": original_file_path,
         "file_type": "pdf"
     }
-    ingested_json = json.dumps(data, ensure_ascii=False)
-    return save_ingested_json(ingested_json, original_file_path, user_id)
+    ingested_json = orjson.dumps(data)
+    return save_ingested_json(ingested_json, original_file_path, user_id, supabase)
 
 
-def ingest_markdown(file_path: str, user_id: str, original_file_path: str) -> str:
+def ingest_markdown(file_path: str, user_id: str, original_file_path: str, supabase: SupabaseClient = None) -> str:
     """
     Process a Markdown file and save the result.
     Args:
         file_path: Path to the temporary file to process
         user_id: User ID for storage
         original_file_path: Original file path from Supabase
+        supabase: Client to upload with; reused across files when provided
     """
     data = {
         "text": markdown_to_text(file_path),
         "source": original_file_path,
         "file_type": "md"
     }
-    ingested_json = json.dumps(data, ensure_ascii=False)
-    return save_ingested_json(ingested_json, original_file_path, user_id)
+    ingested_json = orjson.dumps(data)
+    return save_ingested_json(ingested_json, original_file_path, user_id, supabase)
 
 
-def ingest_html(file_path: str, user_id: str, original_file_path: str) -> str:
+def ingest_html(file_path: str, user_id: str, original_file_path: str, supabase: SupabaseClient = None) -> str:
     """
     Process an HTML file and save the result.
     Args:
         file_path: Path to the temporary file to process
         user_id: User ID for storage
         original_file_path: Original file path from Supabase
+        supabase: Client to upload with; reused across files when provided
     """
     data = {
         "text": html_to_text(file_path),
         "source": original_file_path,
         "file_type": "html"
     }
-    ingested_json = json.dumps(data, ensure_ascii=False)
-    return save_ingested_json(ingested_json, original_file_path, user_id)
+    ingested_json = orjson.dumps(data)
+    return save_ingested_json(ingested_json, original_file_path, user_id, supabase)
 
 
-def save_ingested_json(ingested_json: str, original_file_path: str, user_id: str) -> str:
+def save_ingested_json(ingested_json: bytes, original_file_path: str, user_id: str, supabase: SupabaseClient = None) -> str:
     """
     Save the ingested JSON to Supabase storage.
     Args:
-        ingested_json: The JSON string to save
+        ingested_json: The UTF-8 encoded JSON to save
         original_file_path: The original file path (used to generate the new path)
         user_id: The user ID to associate with the file
+        supabase: Client to upload with; a new one is created if omitted
     Returns:
         The path where the file was saved in Supabase
     """
     try:
         # Initialize Supabase client
-        supabase = SupabaseClient()
+        supabase = supabase or get_supabase_client()
         
         # Generate the path for the processed file
         base_name = os.path.basename(original_file_path)
         # Replace the last period with an underscore
-        json_filename = base_name.rsplit('.', 1)[0] + '_' + base_name.rsplit('.', 1)[1] + '.json'
+        stem, ext = base_name.rsplit('.', 1)
+        json_filename = f"{stem}_{ext}.json"
         storage_path = f"processed/{user_id}/{json_filename}"
         
-        # Upload to Supabase
+        # Upload to Supabase, replacing the copy from an earlier run
         result = supabase.supabase.storage.from_('documents').upload(
             storage_path,
-            ingested_json.encode('utf-8'),
-            {'content-type': 'application/json'}
+            ingested_json,
+            {'content-type': 'application/json', 'upsert': 'true'}
         )
         
         logger.info(f"Saved processed file to Supabase: {storage_path}")
@@ -144,14 +159,14 @@ def ingest_all_files(user_id: str) -> list:
     Ingest all user files from the 'documents' bucket in Supabase storage.
     Returns a list of processed JSON file paths.
     """
-    supabase = SupabaseClient()
+    supabase = get_supabase_client()
     processed_paths = []
     errors = []
 
     try:
         logger.info(f"Fetching files for user_id: {user_id}")
         # Look in the users directory for original files
-        files = supabase.list_files(user_id, prefix="users/")
+        files = list(supabase.iter_files(user_id, prefix="users/"))
         logger.info(f"Found {len(files) if files else 0} files in Supabase storage")
         
         if not files:
@@ -188,11 +203,11 @@ def ingest_all_files(user_id: str) -> list:
                     # Process based on file extension
                     logger.info(f"Processing file with extension: {file_ext}")
                     if file_ext == '.pdf':
-                        processed_path = ingest_pdf(temp_path, user_id, original_file_path)
+                        processed_path = ingest_pdf(temp_path, user_id, original_file_path, supabase)
                     elif file_ext == '.md':
-                        processed_path = ingest_markdown(temp_path, user_id, original_file_path)
+                        processed_path = ingest_markdown(temp_path, user_id, original_file_path, supabase)
                     elif file_ext == '.html':
-                        processed_path = ingest_html(temp_path, user_id, original_file_path)
+                        processed_path = ingest_html(temp_path, user_id, original_file_path, supabase)
                     else:
                         raise ValueError(f"Unsupported file type: {file_ext}")
 
@@ -1,17 +1,32 @@
 import os
-import json
+import asyncio
+import hashlib
+import tempfile
+import orjson
+import tiktoken
 import yaml
 import re
 import string
 from openai import OpenAI, ChatCompletion
+from pydantic import BaseModel, ConfigDict
 from .config import load_config
-from .supabase_client import SupabaseClient
+from .supabase_client import SupabaseClient, get_supabase_client
 import logging
 import argparse
 import sys
+import time
 from typing import List, Dict, Any
 import traceback
-import ast
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from functools import lru_cache
+from itertools import accumulate
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator; falls back to the trigram index
+    ahocorasick = None
 
 
 # Configure logging
@@ -25,6 +40,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_PUNCT_TRANS = str.maketrans('', '', string.punctuation)
+
 def get_api_key():
     """Get API key from environment variable."""
     api_key = os.getenv('OPENAI_API_KEY')
@@ -32,104 +49,415 @@ def get_api_key():
         raise ValueError("OPENAI_API_KEY environment variable not set")
     return api_key
 
+@lru_cache(maxsize=1)
+def get_openai_client() -> OpenAI:
+    """Return a process-wide OpenAI client so concurrent calls share one connection pool.
+
+    The SDK retries 429s and timeouts with exponential backoff on its own.
+    """
+    return OpenAI(api_key=get_api_key(), max_retries=5)
+
 def generate_queries(text: str, num_qs : int = 5) -> list[dict]:
-    prompt = f"""
+    # Identical documents within a run (duplicates, templated policies) share
+    # one API call; the cached JSON is decoded per call so callers never
+    # mutate each other's results.
+    jobs = _window_jobs(text, num_qs)
+    if not jobs:
+        return []
+    if len(jobs) == 1:
+        return orjson.loads(_generate_cached(*jobs[0]))
+
+    # Long documents: query each window concurrently and merge in document order
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        results = list(executor.map(lambda job: _generate_cached(*job), jobs))
+    return [qa for result in results for qa in orjson.loads(result)]
+
+# Structured outputs (json_schema) need a model from the gpt-4o family
+QA_MODEL = "gpt-4o-mini"
+
+class QA(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    question: str
+    answer: str
+
+class QAList(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[QA]
+
+# Same schema for Batch API request bodies, which can't take a Pydantic model
+QA_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "QAList", "strict": True, "schema": QAList.model_json_schema()}
+}
+
+# Longer documents are split into windows of at most this many tokens so no
+# single request carries (and is billed for) the whole document
+MAX_PROMPT_TOKENS = 8000
+
+@lru_cache(maxsize=1)
+def _qa_encoding():
+    return tiktoken.encoding_for_model(QA_MODEL)
+
+def _starts_character(token_bytes: list[bytes], index: int) -> bool:
+    """Return whether a window cut before ``token_bytes[index]`` lands on a UTF-8 character start."""
+    return index >= len(token_bytes) or not 0x80 <= token_bytes[index][0] < 0xC0
+
+def split_for_prompt(text: str, max_tokens: int = MAX_PROMPT_TOKENS) -> list[str]:
+    """Split ``text`` into consecutive windows of at most ``max_tokens`` tokens.
+
+    Windows are cut only where a UTF-8 character starts, so a multibyte
+    character split across tokens never ends up half in each window.
+    """
+    # Every token covers at least one byte, so short texts skip encoding
+    if len(text.encode("utf-8")) <= max_tokens:
+        return [text]
+    encoding = _qa_encoding()
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return [text]
+    token_bytes = encoding.decode_tokens_bytes(tokens)
+    windows = []
+    start = 0
+    while start < len(token_bytes):
+        end = min(start + max_tokens, len(token_bytes))
+        # Back off while the next window would start on a continuation byte
+        while end > start + 1 and not _starts_character(token_bytes, end):
+            end -= 1
+        # A single character can span more tokens than fit; finish it anyway
+        while not _starts_character(token_bytes, end):
+            end += 1
+        windows.append(b"".join(token_bytes[start:end]).decode("utf-8", errors="replace"))
+        start = end
+    return windows
+
+def _window_jobs(text: str, num_qs: int) -> list[tuple[str, int]]:
+    """Pair each prompt window of ``text`` with its share of ``num_qs`` questions."""
+    windows = split_for_prompt(text)
+    per_window, extra = divmod(num_qs, len(windows))
+    jobs = [(window, per_window + (i < extra)) for i, window in enumerate(windows)]
+    return [job for job in jobs if job[1] > 0]
+
+def build_qa_prompt(text: str, num_qs: int) -> str:
+    return f"""
         Here is the text of a document:
         {text}
         
-        Please generate {num_qs} concise, factual question-answer pairs based on this document.
-        IMPORTANT: You must respond with a JSON array containing exactly {num_qs} objects.
-        Each object must have exactly these two keys:
-        - "question": string
-        - "answer": string (exact span from the document)
-        
-        Example format:
-        [
-            {{"question": "What is X?", "answer": "X is..."}},
-            {{"question": "How does Y work?", "answer": "Y works by..."}},
-            {{"question": "When did Z happen?", "answer": "Z happened in..."}}
-        ]
-        
-        Ensure the response is a valid JSON array and nothing else is included.
+        Please generate exactly {num_qs} concise, factual question-answer pairs based on this document.
+        Each answer must be an exact span from the document.
         """
+
+QA_CACHE_DIR = os.path.join("cache", "qa")
+
+def _qa_cache_path(text: str, num_qs: int) -> str:
+    # Content-addressed on everything that shapes the response; changing
+    # QA_MODEL naturally invalidates earlier entries.
+    key = hashlib.blake2b(f"{QA_MODEL}\0{num_qs}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(QA_CACHE_DIR, f"{key}.json")
+
+@lru_cache(maxsize=256)
+def _generate_cached(text: str, num_qs: int) -> bytes:
+    # Re-runs over the same corpus are served from disk instead of re-billing the API
+    cache_path = _qa_cache_path(text, num_qs)
+    try:
+        with open(cache_path, "rb") as f:
+            logger.info(f"Using cached QA pairs from {cache_path}")
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    prompt = build_qa_prompt(text, num_qs)
     
-    api_key = get_api_key()
-    client = OpenAI(api_key=api_key)
-    logger.info(f"Generating {num_qs} QA pairs for document {api_key}")
+    client = get_openai_client()
+    logger.info(f"Generating {num_qs} QA pairs for document")
     
-    logger.info("Making API call to GPT-4...")
+    logger.info(f"Making API call to {QA_MODEL}...")
         
-    response = client.chat.completions.create(
-        model="gpt-4-turbo-preview",
-        messages=[{"role": "user", "content": prompt}]
+    # The response is constrained to the QAList schema, so it always parses
+    completion = client.beta.chat.completions.parse(
+        model=QA_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        response_format=QAList
     )
-    content = response.choices[0].message.content
+    qa_list = completion.choices[0].message.parsed
+    if qa_list is None:
+        raise ValueError(f"Model refused to generate QA pairs: {completion.choices[0].message.refusal}")
+    result = orjson.dumps([qa.model_dump() for qa in qa_list.items])
 
-    content_stripped = re.sub(r'```(?:json)?\s*|\s*```', '', content).strip()
-    try:
-        return json.loads(content_stripped)
-    except json.JSONDecodeError:
-        return ast.literal_eval(content_stripped)
-            
+    # Write atomically so an interrupted run never leaves a truncated entry
+    os.makedirs(QA_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=QA_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(result)
+    os.replace(tmp_path, cache_path)
+    return result
+
+def generate_queries_via_batch(docs: dict[str, str], num_qs: int = 5, poll_interval: float = 30) -> dict[str, list[dict]]:
+    """Generate QA pairs for many documents with a single OpenAI Batch API job.
+
+    Trades latency (results within 24h) for roughly half the per-token cost,
+    which suits offline gold-question generation over a whole corpus.
+
+    Args:
+        docs: Mapping of doc_id to document text
+        num_qs: Number of QA pairs to request per document
+        poll_interval: Seconds to wait between batch status checks
+    Returns:
+        Mapping of doc_id to its QA pairs; documents whose request failed are omitted
+    """
+    client = get_openai_client()
+
+    # One request per prompt window; custom_id "<doc_id>::<window>" maps results back
+    requests_jsonl = b"\n".join(
+        orjson.dumps({
+            "custom_id": f"{doc_id}::{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": QA_MODEL,
+                "messages": [{"role": "user", "content": build_qa_prompt(window, window_qs)}],
+                "response_format": QA_RESPONSE_FORMAT
+            }
+        })
+        for doc_id, text in docs.items()
+        for i, (window, window_qs) in enumerate(_window_jobs(text, num_qs))
+    )
+    batch_file = client.files.create(
+        file=("qa_batch.jsonl", requests_jsonl),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted QA batch {batch.id} for {len(docs)} documents")
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+        logger.info(f"QA batch {batch.id} status: {batch.status}")
 
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"QA batch {batch.id} finished with status {batch.status}")
+
+    windows = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        doc_id, _, window = record["custom_id"].rpartition("::")
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.error(f"QA batch request failed for {doc_id}: {record.get('error') or response}")
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            windows.setdefault(doc_id, []).append(
+                (int(window), [qa.model_dump() for qa in QAList.model_validate_json(content).items])
+            )
+        except Exception as e:
+            logger.error(f"Could not parse QA pairs for {doc_id}: {str(e)}")
+
+    # Output order isn't guaranteed; merge each document's windows in order
+    return {
+        doc_id: [qa for _, qa_pairs in sorted(parts, key=lambda part: part[0]) for qa in qa_pairs]
+        for doc_id, parts in windows.items()
+    }
+
+
+async def generate_queries_batch(texts: list[str], num_qs: int = 5, max_concurrency: int = 20,
+                                 return_exceptions: bool = False) -> list[list[dict]]:
+    """Generate QA pairs for many documents concurrently, preserving input order.
+
+    QA generation is bound by OpenAI latency, so requests are issued from
+    one pool of ``max_concurrency`` worker threads. Long documents are split
+    into prompt windows first and every window is submitted to that same
+    pool, so the whole batch never has more than ``max_concurrency`` requests
+    in flight. Identical windows, e.g. duplicate documents, share a single
+    request. With ``return_exceptions`` a failed document yields its
+    exception instead of aborting the whole batch.
+    """
+    loop = asyncio.get_running_loop()
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        def submit(job: tuple[str, int]) -> asyncio.Future:
+            # Submitted together, duplicates would all miss _generate_cached
+            if job not in futures:
+                futures[job] = loop.run_in_executor(executor, _generate_cached, *job)
+            return futures[job]
+
+        async def one(text: str) -> list[dict]:
+            results = await asyncio.gather(*(submit(job) for job in _window_jobs(text, num_qs)))
+            return [qa for result in results for qa in orjson.loads(result)]
+
+        return await asyncio.gather(*(one(text) for text in texts), return_exceptions=return_exceptions)
+
+@lru_cache(maxsize=4096)
 def normalize(text):
-    return text.lower().translate(str.maketrans('', '', string.punctuation)).strip()
+    # Strip punctuation first so lower() runs over the shorter string; the two
+    # steps commute because ASCII punctuation has no case.
+    return text.translate(_PUNCT_TRANS).lower().strip()
 
 def compact(s: str) -> str:
     return re.sub(r'\s+', '', s)
 
-def map_answers_to_chunks(qa_pairs, chunks_list, strategy):
-    mapped = []
-    for qa in qa_pairs:
-        ans = normalize(qa['answer'])
-        ans_compact = compact(ans)
+def _trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _build_trigram_index(texts: list[str]) -> dict[str, set[int]]:
+    """Map every character trigram to the indices of the texts containing it."""
+    index = defaultdict(set)
+    for i, text in enumerate(texts):
+        for gram in _trigrams(text):
+            index[gram].add(i)
+    return index
+
+def _match_with_automaton(answers: list[str], normalized_chunks: list[str], strategy: str) -> dict[int, int]:
+    """Find each answer's gold chunk with one Aho-Corasick pass over all chunks.
+
+    The chunks are scanned as one concatenated string; a hit is accepted when
+    it lies inside a single chunk or, for fixed_token, straddles two adjacent
+    chunks. Hits arrive in order of their end offset, so the first accepted
+    hit for an answer is the earliest chunk the scan-based matcher would pick.
+
+    Returns:
+        Mapping of answer index to gold chunk index
+    """
+    # An automaton with no words is never built, and iterating it raises
+    if not answers:
+        return {}
+    automaton = ahocorasick.Automaton()
+    for i, ans in enumerate(answers):
+        entry = automaton.get(ans, None)
+        if entry is None:
+            automaton.add_word(ans, (len(ans), [i]))
+        else:
+            entry[1].append(i)
+    automaton.make_automaton()
+
+    chunk_ends = list(accumulate(len(text) for text in normalized_chunks))
+    max_span = 1 if strategy == "fixed_token" else 0
+    gold = {}
+    for end_idx, (length, indices) in automaton.iter("".join(normalized_chunks)):
+        if indices[0] in gold:
+            continue
+        last = bisect_right(chunk_ends, end_idx)
+        first = bisect_right(chunk_ends, end_idx - length + 1)
+        if last - first > max_span:
+            continue
+        for i in indices:
+            gold[i] = last
+        if len(gold) == len(answers):
+            break
+    return gold
+
+def _match_with_index(answers: list[str], normalized_chunks: list[str], strategy: str) -> dict[int, int]:
+    """Find each answer's gold chunk by substring checks pruned with a trigram index.
+
+    Used when pyahocorasick is unavailable. The checks rely on str's built-in
+    search, which is already a vectorized two-way/horspool matcher in C.
 
+    Returns:
+        Mapping of answer index to gold chunk index
+    """
+    index = _build_trigram_index(normalized_chunks)
+    all_chunks = range(len(normalized_chunks))
+    gold = {}
+    if strategy == "fixed_token":
+        # Concatenate each adjacent pair once rather than once per answer
+        pair_texts = [a + b for a, b in zip(normalized_chunks, normalized_chunks[1:])]
+
+    for qa_idx, ans_compact in enumerate(answers):
         # first-chunk check
-        first_text = normalize(chunks_list[0]['text'])
-        if ans_compact in compact(first_text):
-            mapped.append({'question': qa['question'],
-                    'gold_chunk_id': chunks_list[0]['id']})
+        if ans_compact in normalized_chunks[0]:
+            gold[qa_idx] = 0
             continue
 
+        grams = _trigrams(ans_compact)
+
         # check every pair
         if strategy == "fixed_token":
-            for i in range(len(chunks_list) - 1):
-                combined = normalize(chunks_list[i]['text'] + " " +
-                                    chunks_list[i+1]['text'])
-                if ans_compact in compact(combined):
-                    mapped.append({
-                        'question': qa['question'],
-                        'gold_chunk_id': chunks_list[i+1]['id']
-                    })
+            # An answer of 5+ chars split across a chunk boundary leaves a
+            # whole trigram on at least one side, so a pair can only match if
+            # one of its chunks shares a trigram with the answer.
+            if len(ans_compact) >= 5:
+                hits = set().union(*(index.get(g, ()) for g in grams))
+                candidates = sorted({i for h in hits for i in (h - 1, h)
+                                     if 0 <= i < len(normalized_chunks) - 1})
+            else:
+                candidates = range(len(normalized_chunks) - 1)
+            for i in candidates:
+                if ans_compact in pair_texts[i]:
+                    gold[qa_idx] = i + 1
                     break
         else:
-            for chunk in chunks_list:
-                combined = normalize(chunk['text'])
-                if ans_compact in compact(combined):
-                    mapped.append({
-                        'question': qa['question'],
-                        'gold_chunk_id': chunk['id']
-                    })
+            # A chunk containing the answer contains every one of its trigrams.
+            if grams:
+                candidates = sorted(set.intersection(*(index.get(g, set()) for g in grams)))
+            else:
+                candidates = all_chunks
+            for i in candidates:
+                if ans_compact in normalized_chunks[i]:
+                    gold[qa_idx] = i
                     break
 
+    return gold
+
+def map_answers_to_chunks(qa_pairs, chunks_list, strategy):
+    mapped = []
+    if not chunks_list:
+        return mapped
+
+    # Normalize every chunk once; answers that are empty after normalization
+    # cannot identify a chunk and are skipped.
+    normalized_chunks = [compact(normalize(chunk['text'])) for chunk in chunks_list]
+    answered = []
+    for qa in qa_pairs:
+        if not qa.get('answer'):
+            continue
+        ans_compact = compact(normalize(qa['answer']))
+        if ans_compact:
+            answered.append((qa, ans_compact))
+
+    answers = [ans for _, ans in answered]
+    if ahocorasick is not None:
+        gold = _match_with_automaton(answers, normalized_chunks, strategy)
+    else:
+        gold = _match_with_index(answers, normalized_chunks, strategy)
+
+    for qa_idx, (qa, _) in enumerate(answered):
+        if qa_idx in gold:
+            mapped.append({
+                'question': qa['question'],
+                'gold_chunk_id': chunks_list[gold[qa_idx]]['id']
+            })
+
     return mapped
     
 
-def save_qa_pairs(qa_pairs: list[dict], doc_id: str, user_id: str) -> str:
+def load_chunks(doc_id: str, user_id: str, strategy: str, supabase: SupabaseClient = None) -> list[dict]:
+    """Load a document's chunks for ``strategy`` in the shape map_answers_to_chunks expects."""
+    supabase = supabase or get_supabase_client()
+    chunk_list = supabase.fetch_json_list(f"{doc_id}_chunks.ndjson.gz", user_id, f"chunks/{strategy}/")
+    return [{'text': chunk['text'], 'id': chunk['chunk_id']} for chunk in chunk_list]
+
+def save_qa_pairs(qa_pairs: list[dict], doc_id: str, user_id: str, supabase: SupabaseClient = None) -> str:
     """Save QA pairs to Supabase storage."""
     try:
-        supabase = SupabaseClient()
+        supabase = supabase or get_supabase_client()
         
         # Create the storage path with the correct prefix
         storage_path = f"qa_pairs/{user_id}/{doc_id}_qa.json"
         logger.info(f"Saving QA pairs to path: {storage_path}")
         
         # Save to Supabase
-        qa_json = json.dumps(qa_pairs, ensure_ascii=False)
+        qa_json = orjson.dumps(qa_pairs)
         result = supabase.supabase.storage.from_('documents').upload(
             storage_path,
-            qa_json.encode('utf-8'),
-            {'content-type': 'application/json'}
+            qa_json,
+            {'content-type': 'application/json', 'upsert': 'true'}
         )
         
         if not result:
@@ -142,24 +470,39 @@ def save_qa_pairs(qa_pairs: list[dict], doc_id: str, user_id: str) -> str:
         logger.error(f"Error saving QA pairs: {str(e)}")
         raise
 
-def process_document(doc_id: str, doc_data: dict, user_id: str, num_questions: int = 5) -> str:
-    """Process a document to generate and save QA pairs."""
+def process_document(doc_id: str, doc_data: dict, user_id: str, num_questions: int = 5,
+                     qa_pairs: list[dict] = None, strategy: str = "fixed_token",
+                     supabase: SupabaseClient = None, jsonl_out=None) -> str:
+    """Process a document to generate and save QA pairs.
+
+    If ``qa_pairs`` were already generated (e.g. concurrently by ``main``),
+    the generation step is skipped. Pass ``supabase`` to reuse one client
+    (and its connection pool) across documents. If ``jsonl_out`` (a binary
+    file) is given, the mapped pairs are also appended to it as one
+    ``{doc_id: mapped}`` JSON line.
+    """
     try:
         logger.info(f"Starting QA pair generation for document {doc_id}")
         
         # Generate QA pairs
-        logger.info(f"Generating {num_questions} QA pairs for document {doc_id}")
-        qa_pairs = generate_queries(doc_id, doc_data['text'], num_questions)
+        if qa_pairs is None:
+            logger.info(f"Generating {num_questions} QA pairs for document {doc_id}")
+            qa_pairs = generate_queries(doc_data['text'], num_questions)
         logger.info(f"Generated {len(qa_pairs)} QA pairs")
         
         # Map answers to chunks
         logger.info(f"Mapping answers to chunks for document {doc_id}")
-        mapped_qa = map_answers_to_chunks(doc_id, qa_pairs, user_id)
+        supabase = supabase or get_supabase_client()
+        chunks = load_chunks(doc_id, user_id, strategy, supabase)
+        mapped_qa = map_answers_to_chunks(qa_pairs, chunks, strategy)
         logger.info(f"Mapped {len(mapped_qa)} QA pairs to chunks")
+        if jsonl_out is not None:
+            jsonl_out.write(orjson.dumps({doc_id: mapped_qa}) + b"\n")
+            jsonl_out.flush()
         
         # Save QA pairs
         logger.info(f"Saving QA pairs for document {doc_id}")
-        storage_path = save_qa_pairs(mapped_qa, doc_id, user_id)
+        storage_path = save_qa_pairs(mapped_qa, doc_id, user_id, supabase)
         logger.info(f"Successfully saved QA pairs to {storage_path}")
         
         return storage_path
@@ -169,57 +512,107 @@ def process_document(doc_id: str, doc_data: dict, user_id: str, num_questions: i
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def download_document(supabase: SupabaseClient, file_path: str, user_id: str):
+    """Download and parse one processed document.
+
+    Returns:
+        ``(file_path, doc_id, doc_data)``, or None if the file could not be loaded.
+    """
+    try:
+        # Get document ID from filename
+        doc_id = os.path.splitext(os.path.basename(file_path))[0]
+        logger.info(f"Downloading file: {file_path} (doc_id: {doc_id})")
+        
+        file_data = supabase.download_file(file_path, user_id, prefix="processed/")
+        if not file_data:
+            raise ValueError(f"Failed to download file: {file_path}")
+            
+        # Parse the JSON
+        doc_data = orjson.loads(file_data)
+        logger.info(f"Successfully loaded document data for {doc_id}")
+        return file_path, doc_id, doc_data
+        
+    except Exception as e:
+        logger.error(f"Error processing {file_path}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return None
+
 def main():
     parser = argparse.ArgumentParser(description='Generate QA pairs for documents')
     parser.add_argument('--user-id', required=True, help='User ID for storage')
     parser.add_argument('--num-questions', type=int, default=5, help='Number of questions per document')
+    parser.add_argument('--max-concurrency', type=int, default=20, help='Maximum concurrent QA generation requests')
+    parser.add_argument('--strategy', default='fixed_token', choices=['fixed_token', 'sliding_window', 'sentence_aware'],
+                        help='Chunking strategy whose chunks the answers are mapped to')
+    parser.add_argument('--batch', action='store_true', help='Submit QA generation as one OpenAI Batch API job (results within 24h, ~50%% cheaper)')
+    parser.add_argument('--jsonl', help='Also append each document\'s mapped QA pairs to this JSONL file as they are produced')
     args = parser.parse_args()
     
     try:
         logger.info(f"Starting QA pair generation for user {args.user_id}")
         
         # Initialize Supabase client
-        supabase = SupabaseClient()
+        supabase = get_supabase_client()
         
         # Get all processed files for the user
         logger.info(f"Listing processed files for user {args.user_id}")
-        processed_files = supabase.list_files(args.user_id, prefix="processed/")
-        if not processed_files:
+        processed_files = supabase.iter_files(args.user_id, prefix="processed/", page_size=500)
+        
+        # Download every document first so QA generation can run concurrently.
+        # Listing is paged and each download is handed to a thread pool as soon
+        # as its page arrives, so downloads overlap with fetching the next page.
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = [
+                executor.submit(download_document, supabase, file_info['name'], args.user_id)
+                for file_info in processed_files
+                if file_info['name'].endswith('.json')
+            ]
+            docs = [doc for doc in (future.result() for future in futures) if doc is not None]
+
+        if not docs:
             logger.warning(f"No processed files found for user {args.user_id}")
             return
-            
-        logger.info(f"Found {len(processed_files)} processed files")
-        
-        # Process each file
-        for file_info in processed_files:
-            try:
-                file_path = file_info['name']
-                if not file_path.endswith('.json'):
-                    logger.debug(f"Skipping non-JSON file: {file_path}")
-                    continue
-                    
-                # Get document ID from filename
-                doc_id = os.path.splitext(os.path.basename(file_path))[0]
-                logger.info(f"Processing file: {file_path} (doc_id: {doc_id})")
-                
-                # Download the processed file
-                logger.info(f"Downloading file: {file_path}")
-                file_data = supabase.download_file(file_path, args.user_id, prefix="processed/")
-                if not file_data:
-                    raise ValueError(f"Failed to download file: {file_path}")
+        logger.info(f"Loaded {len(docs)} processed files")
+
+        # Generate QA pairs for all documents, either concurrently in real time
+        # or as one discounted Batch API job
+        logger.info(f"Generating QA pairs for {len(docs)} documents")
+        if args.batch:
+            batch_results = generate_queries_via_batch(
+                {doc_id: doc_data['text'] for _, doc_id, doc_data in docs},
+                args.num_questions
+            )
+            qa_lists = [
+                batch_results.get(doc_id, ValueError(f"No batch result for {doc_id}"))
+                for _, doc_id, _ in docs
+            ]
+        else:
+            qa_lists = asyncio.run(generate_queries_batch(
+                [doc_data['text'] for _, _, doc_data in docs],
+                args.num_questions,
+                args.max_concurrency,
+                return_exceptions=True
+            ))
+
+        # Process each file, streaming results to the JSONL file if requested
+        jsonl_out = open(args.jsonl, 'ab') if args.jsonl else None
+        try:
+            for (file_path, doc_id, doc_data), qa_pairs in zip(docs, qa_lists):
+                try:
+                    if isinstance(qa_pairs, Exception):
+                        raise qa_pairs
+                    qa_path = process_document(doc_id, doc_data, args.user_id, args.num_questions,
+                                               qa_pairs=qa_pairs, strategy=args.strategy, supabase=supabase,
+                                               jsonl_out=jsonl_out)
+                    logger.info(f"Successfully processed {file_path} -> {qa_path}")
                     
-                # Parse the JSON
-                doc_data = json.loads(file_data.decode('utf-8'))
-                logger.info(f"Successfully loaded document data for {doc_id}")
-                
-                # Process the document
-                qa_path = process_document(doc_id, doc_data, args.user_id, args.num_questions)
-                logger.info(f"Successfully processed {file_path} -> {qa_path}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                continue
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {str(e)}")
+                    logger.error(f"Traceback: {traceback.format_exc()}")
+                    continue
+        finally:
+            if jsonl_out is not None:
+                jsonl_out.close()
                 
     except Exception as e:
         logger.error(f"Error in main: {str(e)}")
@@ -5,6 +5,12 @@ import argparse
 from typing import List, Dict, Any
 import logging
 import traceback
+import orjson
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import product
+from .config import load_config
+from .supabase_client import encode_ndjson_gz, get_supabase_client
 
 # Configure logging
 logging.basicConfig(
@@ -12,27 +18,34 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler('chunking.log')
+        # Not created until something is logged. Unbuffered and never rotated,
+        # since forked chunking workers write to it too and exit without
+        # flushing logging buffers
+        logging.FileHandler('chunking.log', delay=True)
     ]
 )
 logger = logging.getLogger(__name__)
 
 
 
+@lru_cache(maxsize=None)
+def _get_chunker(strategy: str):
+    """Import a strategy's chunking function once per process."""
+    if strategy == "fixed_token":
+        from .chunking.fixed_token import fixed_token_chunk
+        return fixed_token_chunk
+    if strategy == "sliding_window":
+        from .chunking.sliding_window import sliding_window_chunk
+        return sliding_window_chunk
+    if strategy == "sentence_aware":
+        from .chunking.sentence_aware import sentence_aware_chunk
+        return sentence_aware_chunk
+    raise ValueError(f"Invalid chunking strategy: {strategy}")
+
 def chunk_text(text: str, strategy: str, doc_name: str, model_name: str, provider: str, config: dict) -> List[Dict[str, Any]]:
     """Chunk text based on the specified strategy."""
     try:
-        if strategy == "fixed_token":
-            from .chunking.fixed_token import fixed_token_chunk
-            return fixed_token_chunk(text, doc_name, config, model_name, provider)
-        elif strategy == "sliding_window":
-            from .chunking.sliding_window import sliding_window_chunk
-            return sliding_window_chunk(text, doc_name, config, model_name, provider)
-        elif strategy == "sentence_aware":
-            from .chunking.sentence_aware import sentence_aware_chunk
-            return sentence_aware_chunk(text, doc_name, config, model_name, provider)
-        else:
-            raise ValueError(f"Invalid chunking strategy: {strategy}")
+        return _get_chunker(strategy)(text, doc_name, config, model_name, provider)
     except ImportError as e:
         logger.error(f"Failed to import chunking module: {str(e)}")
         raise
@@ -41,4 +54,143 @@ def chunk_text(text: str, strategy: str, doc_name: str, model_name: str, provide
         raise
 
 
+_worker_config = None
+
+def _init_worker(config: dict) -> None:
+    # Runs once per worker process so the config is pickled per worker, not per job
+    global _worker_config
+    _worker_config = config
+    # Build this worker's client (and connection pool) up front
+    get_supabase_client()
+
+def _chunk_job(job: tuple) -> List[Dict[str, Any]]:
+    text, strategy, doc_name, model_name, provider = job
+    return chunk_text(text, strategy, doc_name, model_name, provider, _worker_config)
+
+def chunk_documents(docs: List[tuple], strategies: List[str], model_name: str, provider: str, config: dict,
+                    max_workers: int = None) -> Dict[str, List[List[Dict[str, Any]]]]:
+    """Chunk every (document, strategy) combination in parallel worker processes.
+
+    Args:
+        docs: List of (doc_name, text) tuples
+        strategies: Chunking strategies to apply to every document
+        max_workers: Number of worker processes (defaults to os.cpu_count())
+    Returns:
+        Mapping of strategy to the chunk lists of each document, in ``docs`` order
+    """
+    jobs = [
+        (text, strategy, doc_name, model_name, provider)
+        for strategy, (doc_name, text) in product(strategies, docs)
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(config,)) as executor:
+        results = iter(executor.map(_chunk_job, jobs))
+        return {strategy: [next(results) for _ in docs] for strategy in strategies}
+
+
+def process_document(file_name: str, user_id: str, strategy: str, model_name: str, provider: str) -> tuple:
+    """Download one processed document, chunk it and encode the chunks for upload.
+
+    Runs inside a ``chunk`` worker process, using that worker's config and client.
+    Uploading is left to the parent process so all uploads share one connection pool.
+
+    Returns:
+        (file_name, chunk file name, encoded NDJSON payload, number of chunks)
+    """
+    supabase = get_supabase_client()
+    file_data = supabase.download_file(file_name, user_id, prefix="processed/")
+    if not file_data:
+        raise ValueError(f"Failed to download file: {file_name}")
+    doc_data = orjson.loads(file_data)
+
+    doc_id = os.path.splitext(file_name)[0]
+    chunks = chunk_text(doc_data['text'], strategy, doc_id, model_name, provider, _worker_config)
+    owner = {'user_id': user_id}
+    for chunk in chunks:
+        chunk.update(owner)
+
+    return file_name, f"{doc_id}_chunks.ndjson.gz", encode_ndjson_gz(chunks), len(chunks)
+
+
+def run(strategy: str, user_id: str, config: dict, max_workers: int = None,
+        upload_workers: int = 16) -> List[str]:
+    """Chunk all of a user's processed documents with ``strategy`` and upload the chunks.
+
+    Args:
+        strategy: Chunking strategy to apply
+        user_id: User ID for storage
+        config: Loaded chunking config
+        max_workers: Worker processes (defaults to os.cpu_count())
+        upload_workers: Concurrent chunk uploads from this process
+    Returns:
+        Names of the processed files that were chunked
+    Raises:
+        Exception: Summarizing every document that failed, after all were attempted
+    """
+    provider = config['embedding'][0]
+    model_name = config[provider][0]['model']
+
+    supabase = get_supabase_client()
+    # Listing is paged lazily, so workers start on the first page while
+    # later pages are still being fetched
+    processed_files = (
+        f['name'] for f in supabase.iter_files(user_id, prefix="processed/")
+        if f['name'].endswith('.json')
+    )
+
+    # Download and tokenization happen in the worker processes, so documents
+    # are chunked on every core at once; finished payloads are uploaded from
+    # a thread pool here, reusing this process's single client
+    chunk_prefix = f"chunks/{strategy}"
+    chunked = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(config,)) as executor, \
+            ThreadPoolExecutor(max_workers=upload_workers) as uploader:
+        futures = {
+            executor.submit(process_document, file_name, user_id, strategy, model_name, provider): file_name
+            for file_name in processed_files
+        }
+        logger.info(f"Chunking {len(futures)} documents with {strategy}")
+        uploads = {}
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                _, chunk_file, payload, num_chunks = future.result()
+                logger.info(f"Chunked {file_name} into {num_chunks} chunks")
+                uploads[uploader.submit(supabase.put_ndjson_gz, payload, chunk_file, user_id, chunk_prefix)] = file_name
+            except Exception as e:
+                errors.append(f"Error chunking {file_name}: {str(e)}")
+
+        for future in as_completed(uploads):
+            file_name = uploads[future]
+            try:
+                future.result()
+                chunked.append(file_name)
+            except Exception as e:
+                errors.append(f"Error uploading chunks for {file_name}: {str(e)}")
+
+    if errors:
+        error_summary = "\n".join(errors)
+        logger.error(f"Errors occurred during chunking:\n{error_summary}")
+        raise Exception(f"Errors occurred during chunking:\n{error_summary}")
+
+    return chunked
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunk a user\'s processed documents')
+    parser.add_argument('--user-id', required=True, help='User ID for storage')
+    parser.add_argument('--strategy', required=True, choices=['fixed_token', 'sliding_window', 'sentence_aware'],
+                        help='Chunking strategy to apply')
+    parser.add_argument('--config', default='config/default.yaml', help='Path to the YAML config')
+    parser.add_argument('--max-workers', type=int, default=None, help='Worker processes (defaults to the CPU count)')
+    args = parser.parse_args()
+
+    try:
+        run(args.strategy, args.user_id, load_config(args.config), args.max_workers)
+    except Exception as e:
+        logger.error(f"Error in main: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        sys.exit(1)
 
+if __name__ == "__main__":
+    main()
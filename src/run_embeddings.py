@@ -1,15 +1,87 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain, islice
+from typing import Iterable, Iterator
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.embedding_router import embed
+from src.embedding_router import embed_batch
+from src.vectorStore import start_bulk_load, finish_bulk_load
+from src.supabase_client import get_supabase_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_embeddings(chunk_list: list[dict], user_id: str):
-    for chunk in chunk_list:
-        logger.info(f"Embedding chunk: {chunk['chunk_id']}")
-        embed(chunk, user_id)
+# Chunks sent to the provider per embedding request
+BATCH_SIZE = 128
 
+def batched(chunks: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    """Yield lists of up to ``size`` chunks, pulling from ``chunks`` lazily."""
+    it = iter(chunks)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def run_embeddings(chunks: Iterable[dict], user_id: str, max_workers: int = 16):
+    """Embed and upsert every chunk, with up to ``max_workers`` batch requests in flight.
+
+    ``chunks`` may be any iterable, e.g. a list or ``SupabaseClient.iter_ndjson``;
+    it is consumed ``BATCH_SIZE`` chunks at a time and only a few batches beyond
+    those in flight are held in memory. Batches run from a thread pool so
+    provider round-trips overlap. Failures are collected and raised together
+    once every batch has been attempted.
+    """
+    # The first upsert creates the collection with the embedding dimension;
+    # a new collection is bulk loaded and indexed once at the end
+    collection_name = f"autoembed_chunks_{user_id}"
+    start_bulk_load(collection_name)
+
+    errors = []
+    embedded = 0
+
+    def collect(future, batch):
+        nonlocal embedded
+        first, last = batch[0]['chunk_id'], batch[-1]['chunk_id']
+        try:
+            future.result()
+            embedded += len(batch)
+            logger.debug(f"Embedded chunks {first} .. {last}")
+        except Exception as e:
+            errors.append(f"Error embedding chunks {first} .. {last}: {str(e)}")
+
+    # Indexing must come back on even if reading the chunk stream fails
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            for batch in batched(chunks, BATCH_SIZE):
+                # Bound read-ahead so a long stream is never materialized
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future, pending.pop(future))
+                pending[executor.submit(embed_batch, batch, user_id)] = batch
+            for future in wait(pending).done:
+                collect(future, pending[future])
+    finally:
+        finish_bulk_load(collection_name)
+    logger.info(f"Embedded {embedded} chunks")
+
+    if errors:
+        error_summary = "\n".join(errors)
+        logger.error(f"Errors occurred during embedding:\n{error_summary}")
+        raise Exception(f"Errors occurred during embedding:\n{error_summary}")
+
+
+def run(strategy: str, user_id: str, config: dict):
+    """Embed every chunk stored for ``strategy`` for a user.
+
+    Chunk files are streamed from storage one record at a time, so memory stays
+    bounded by the embedding batches in flight rather than the corpus size.
+    """
+    supabase = get_supabase_client()
+    prefix = f"chunks/{strategy}/"
+    chunks = chain.from_iterable(
+        supabase.iter_ndjson(f['name'], user_id, prefix)
+        for f in supabase.iter_files(user_id, prefix=prefix)
+    )
+    run_embeddings(chunks, user_id, config.get('embed_max_workers', 16))
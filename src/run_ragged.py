@@ -1,11 +1,13 @@
 import os
 import sys
-import json
+import asyncio
+import orjson
+import hashlib
+import numpy as np
 import argparse
-import subprocess
 import traceback
-import requests
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List, Dict, Any
 import logging
 from supabase_client import SupabaseClient
@@ -26,28 +28,43 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from embedding_router import get_embedder
-from vectorStore import search
-from config import load_config
+from vectorStore import search_batch, clear_collection
+from config import load_config, get_embed_concurrency
+from src.run_chunking import run as run_chunking
+from src.run_embeddings import run as run_embeddings
 from ingest import ingest_file
-from querier import generate_queries, map_answers_to_chunks
+from querier import generate_queries_batch, map_answers_to_chunks, load_chunks
 from evaluate_retrieval import evaluate_retrieval
 
-def validate_config(config: dict) -> None:
-    """Validate the configuration parameters."""
-    required_fields = {
-        "fixed_chunk_size": int,
-        "overlap": int,
-        "sentence_max_tokens": int
-    }
-    
-    for field, field_type in required_fields.items():
-        if field not in config:
-            raise ValueError(f"Missing required config field: {field}")
-        if not isinstance(config[field], field_type):
-            raise ValueError(f"Invalid type for {field}. Expected {field_type}, got {type(config[field])}")
-    
-    if config["overlap"] >= config["fixed_chunk_size"]:
-        raise ValueError("Overlap must be smaller than chunk size")
+def list_files(directory: str, suffix: str = "") -> List[str]:
+    """Names of the regular files in ``directory`` that end with ``suffix``."""
+    # scandir's entries carry the file type, so no per-file stat is needed
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries if entry.is_file() and entry.name.endswith(suffix)]
+
+# JSON readers and writers do many small I/O calls; a large buffer amortizes the syscalls
+IO_BUFFER_SIZE = 1024 * 1024
+
+def read_json(path: str):
+    """Load a JSON file with orjson."""
+    with open(path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        return orjson.loads(f.read())
+
+def write_json(path: str, obj, durable: bool = False) -> None:
+    """Write ``obj`` as indented JSON, atomically replacing ``path``.
+
+    Args:
+        path: Destination file
+        obj: JSON-serializable object
+        durable: fsync the data before the rename so it survives a power loss
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 def validate_document(doc_data: Dict[str, Any]) -> None:
     """Validate the document data structure."""
@@ -92,117 +109,219 @@ def clear_directories():
     ]
     
     for directory in directories:
-        if os.path.exists(directory):
-            print(f"Clearing directory: {directory}")
-            for filename in os.listdir(directory):
-                file_path = os.path.join(directory, filename)
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                except Exception as e:
-                    print(f"Error deleting {file_path}: {str(e)}")
-        else:
-            os.makedirs(directory, exist_ok=True)
-            print(f"Created directory: {directory}")
+        print(f"Clearing directory: {directory}")
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
 
-def clear_qdrant():
-    """Clear all points from the Qdrant collection."""
+def clear_qdrant(user_id: str):
+    """Clear all points from the user's Qdrant collection."""
     try:
-        response = requests.post(
-            'http://localhost:6333/collections/autoembed_chunks/points/delete',
-            json={"filter": {}},
-            headers={'Content-Type': 'application/json'}
-        )
-        if response.status_code == 200:
-            print("Successfully cleared Qdrant collection")
-        else:
-            print(f"Warning: Failed to clear Qdrant collection. Status code: {response.status_code}")
+        # Goes through vectorStore's shared client instead of a one-off HTTP request
+        clear_collection(f"autoembed_chunks_{user_id}")
+        print("Successfully cleared Qdrant collection")
     except Exception as e:
         print(f"Warning: Could not connect to Qdrant: {str(e)}")
 
-def query_golden_questions(cfg):
-    """Query Qdrant with each question from golden_qs files."""
-    print("\nStep 5: Querying with golden questions...")
+# --incremental bookkeeping: sha256 of each input file that was ingested and
+# of each document text (plus question count) whose QA pairs were saved
+MANIFEST_PATH = os.path.join(project_root, '.cache', 'manifest.json')
+
+def file_sha256(path: str) -> str:
+    """Hex sha256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(IO_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def qa_key(text: str, num_qs: int) -> str:
+    """Manifest key for the QA pairs generated from ``text``."""
+    return hashlib.sha256(f"{num_qs}\0{text}".encode('utf-8')).hexdigest()
+
+def ingested_doc_id(filename: str) -> str:
+    """Doc id of an input file, matching the name ingest gives its processed JSON."""
+    stem, _, ext = filename.rpartition('.')
+    return f"{stem}_{ext}"
+
+def load_manifest() -> dict:
+    """Load the incremental-run manifest, or an empty one."""
+    try:
+        manifest = read_json(MANIFEST_PATH)
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        manifest = {}
+    manifest.setdefault("files", {})
+    manifest.setdefault("qa", {})
+    return manifest
+
+def save_manifest(manifest: dict) -> None:
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    write_json(MANIFEST_PATH, manifest)
+
+# Question embeddings persisted across strategies and runs, keyed by
+# sha256(model + question): .cache/qemb.npy holds the vectors and
+# .cache/qemb_index.json the key of each row
+QEMB_CACHE_DIR = os.path.join(project_root, '.cache')
+_question_embeddings = None
+
+def _load_question_embeddings() -> dict:
+    global _question_embeddings
+    if _question_embeddings is None:
+        _question_embeddings = {}
+        try:
+            keys = read_json(os.path.join(QEMB_CACHE_DIR, 'qemb_index.json'))
+            vectors = np.load(os.path.join(QEMB_CACHE_DIR, 'qemb.npy'))
+            _question_embeddings = dict(zip(keys, vectors))
+        except FileNotFoundError:
+            pass
+    return _question_embeddings
+
+def _save_question_embeddings(cache: dict) -> None:
+    os.makedirs(QEMB_CACHE_DIR, exist_ok=True)
+    npy_path = os.path.join(QEMB_CACHE_DIR, 'qemb.npy')
+    with open(f"{npy_path}.tmp", 'wb') as f:
+        np.save(f, np.asarray(list(cache.values()), dtype=np.float32))
+    os.replace(f"{npy_path}.tmp", npy_path)
+    write_json(os.path.join(QEMB_CACHE_DIR, 'qemb_index.json'), list(cache))
+
+def embed_questions(embedder, questions: list) -> list:
+    """Embed questions, reusing vectors computed by earlier strategies or runs."""
+    cache = _load_question_embeddings()
+    keys = [hashlib.sha256(f"{embedder.model_name}\0{q}".encode('utf-8')).hexdigest() for q in questions]
+    missing = {key: q for key, q in zip(keys, questions) if key not in cache}
+    if missing:
+        for key, vector in zip(missing, embedder.embed_batch(list(missing.values()))):
+            cache[key] = np.asarray(vector, dtype=np.float32)
+        _save_question_embeddings(cache)
+    print(f"Embedded {len(missing)} new questions ({len(questions) - len(missing)} cached)")
+    return [cache[key].tolist() for key in keys]
+
+def get_query_embedder(cfg):
+    """Embedder used for the golden questions."""
+    return get_embedder("openai", cfg["openai"][0]["model"], concurrency=get_embed_concurrency(cfg))
+
+def query_golden_questions(cfg, user_id: str, embedder=None, show_text: bool = False, strategy: str = None):
+    """Query Qdrant with each question from golden_qs files.
+
+    Args:
+        cfg: Loaded pipeline configuration.
+        user_id: User whose collection is searched.
+        embedder: Embedder for the questions; pass one in to reuse it across strategies.
+        show_text: Fetch each hit's chunk text and log a preview of it.
+        strategy: Read the questions from golden_qs/<strategy>/ instead of golden_qs/.
+    """
+    print("\nStep 6: Querying with golden questions...")
     
-    # Get embedder for querying
-    embedder = get_embedder("openai", cfg["openai"][0]["model"])
+    if embedder is None:
+        embedder = get_query_embedder(cfg)
     top_k = cfg.get("objectives", {}).get("retrieval_top_k", 5)
     
-    # Process each golden questions file
-    golden_qs_dir = os.path.join(os.path.dirname(__file__), '..', 'golden_qs')
-    for filename in os.listdir(golden_qs_dir):
-        if not filename.endswith('_golden.json'):
-            continue
-            
+    # Collect every golden question first so they can be embedded and
+    # searched in batches instead of one round-trip each
+    golden_qs_dir = os.path.join(project_root, 'golden_qs', *([strategy] if strategy else []))
+    questions = []
+    for filename in list_files(golden_qs_dir, '_golden.json'):
         doc_id = filename.replace('_golden.json', '')
-        print(f"\nProcessing questions for: {doc_id}")
-        
         try:
-            # Load the golden questions
-            with open(os.path.join(golden_qs_dir, filename), 'r', encoding='utf-8') as f:
-                questions = json.load(f)
-            
-            # Query each question
-            for q in questions:
-                print(f"\nQuestion: {q['question']}")
-                print(f"Expected chunk ID: {q['gold_chunk_id']}")
-                
-                # Get query embedding and search
-                query_vector = embedder.embed(q['question'])
-                hits = search(query_vector, top_k=top_k)
-                
-                # Display results
-                print(f"\nTop {top_k} results:")
-                for rank, hit in enumerate(hits, start=1):
-                    payload = hit.payload or {}
-                    chunk_id = payload.get("chunk_id", hit.id)
-                    source = payload.get("source", "<unknown>")
-                    strategy = payload.get("strategy", "<unknown>")
-                    score = hit.score
-                    print(f"{rank:2d}. {chunk_id} (source={source}, strategy={strategy}) → score={score:.4f}")
-                    print(f"   Text: {payload.get('text', '')[:200]}...")
-                    
+            questions.extend((doc_id, q) for q in read_json(os.path.join(golden_qs_dir, filename)))
         except Exception as e:
-            print(f"Error processing questions for {doc_id}: {str(e)}")
+            print(f"Error loading questions for {doc_id}: {str(e)}")
             print("Full traceback:")
             print(traceback.format_exc())
 
-def clear_chunks_and_golden_qs_and_qdrant():
-    """Clear the contents of the chunks directory, the golden_qs directory, and the Qdrant collection."""
-    # Clear chunks directory
-    chunks_dir = os.path.join(project_root, 'chunks')
-    if os.path.exists(chunks_dir):
-        print(f"Clearing directory: {chunks_dir}")
-        for filename in os.listdir(chunks_dir):
-            file_path = os.path.join(chunks_dir, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-            except Exception as e:
-                print(f"Error deleting {file_path}: {str(e)}")
-    else:
-        os.makedirs(chunks_dir, exist_ok=True)
-        print(f"Created directory: {chunks_dir}")
-
-    # Clear golden_qs directory
-    golden_qs_dir = os.path.join(project_root, 'golden_qs')
-    if os.path.exists(golden_qs_dir):
-        print(f"Clearing directory: {golden_qs_dir}")
-        for filename in os.listdir(golden_qs_dir):
-            file_path = os.path.join(golden_qs_dir, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-            except Exception as e:
-                print(f"Error deleting {file_path}: {str(e)}")
-    else:
-        os.makedirs(golden_qs_dir, exist_ok=True)
-        print(f"Created directory: {golden_qs_dir}")
+    if not questions:
+        print("No golden questions found.")
+        return
+
+    try:
+        query_vectors = embed_questions(embedder, [q['question'] for _, q in questions])
+        all_hits = search_batch(query_vectors, f"autoembed_chunks_{user_id}", limit=top_k, include_text=show_text,
+                                hnsw_ef=cfg.get("objectives", {}).get("ef_search", 128))
+    except Exception as e:
+        print(f"Error querying golden questions: {str(e)}")
+        print("Full traceback:")
+        print(traceback.format_exc())
+        return
+
+    print(f"Queried {len(questions)} golden questions")
+
+    # Per-hit details are only formatted when --verbose is on
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for (doc_id, q), hits in zip(questions, all_hits):
+        logger.debug(f"Question ({doc_id}): {q['question']}")
+        logger.debug(f"Expected chunk ID: {q['gold_chunk_id']}")
+        logger.debug(f"Top {top_k} results:")
+        for rank, hit in enumerate(hits, start=1):
+            payload = hit.payload or {}
+            chunk_id = payload.get("chunk_id", hit.id)
+            source = payload.get("source", "<unknown>")
+            strategy = payload.get("strategy", "<unknown>")
+            logger.debug(f"{rank:2d}. {chunk_id} (source={source}, strategy={strategy}) → score={hit.score:.4f}")
+            if show_text:
+                logger.debug(f"   Text: {payload.get('text', '')[:200]}...")
+
+def clear_chunks_and_golden_qs_and_qdrant(strategy: str, user_id: str):
+    """Clear a strategy's chunks and golden_qs directories, and the user's Qdrant collection."""
+    for directory in (os.path.join(project_root, 'chunks', strategy), os.path.join(project_root, 'golden_qs', strategy)):
+        print(f"Clearing directory: {directory}")
+        shutil.rmtree(directory, ignore_errors=True)
 
     # Clear Qdrant collection
-    clear_qdrant()
+    clear_qdrant(user_id)
+
+def run_strategy(strategy: str, user_id: str, cfg: dict, doc_ids: List[str], max_workers: int = None) -> str:
+    """Chunk the corpus with one strategy and map its QA pairs onto the chunks (steps 3-4).
+
+    Strategies write to their own chunks/<strategy>/ and golden_qs/<strategy>/
+    locations, so several of these can run at once.
+
+    Returns:
+        The strategy's golden_qs directory
+    """
+    og_qa_dir = os.path.join(project_root, 'querying', 'og_qa')
+    golden_qs_dir = os.path.join(project_root, 'golden_qs', strategy)
+    os.makedirs(golden_qs_dir, exist_ok=True)
+
+    # Run chunking with the current strategy
+    print(f"\nStep 3: Running chunking with strategy: {strategy}")
+    run_chunking(strategy, user_id, cfg, max_workers=max_workers)
+    print(f"\nSuccessfully completed chunking with {strategy} strategy")
+
+    # Map answers to chunks and save to golden_qs
+    print(f"\nStep 4: Mapping answers to {strategy} chunks...")
+    for doc_id in doc_ids:
+        try:
+            # Load the QA pairs and this strategy's chunks
+            qa_pairs = read_json(os.path.join(og_qa_dir, f"{doc_id}_qa.json"))
+            chunks = load_chunks(doc_id, user_id, strategy)
+            
+            # Map answers to chunks
+            mapped_answers = map_answers_to_chunks(qa_pairs, chunks, strategy)
+            
+            # Save mapped answers
+            output_path = os.path.join(golden_qs_dir, f"{doc_id}_golden.json")
+            write_json(output_path, mapped_answers, durable=cfg.get("durable", False))
+            print(f"Saved mapped answers to: {output_path}")
+            
+        except Exception as e:
+            print(f"Error mapping answers for {doc_id}: {str(e)}")
+            print("Full traceback:")
+            print(traceback.format_exc())
+
+    return golden_qs_dir
 
 def main():
+    parser = argparse.ArgumentParser(description='Run the full RAGged pipeline')
+    parser.add_argument('--user-id', required=True, help='User ID for storage')
+    parser.add_argument('--verbose', action='store_true', help='Log per-question retrieval results')
+    parser.add_argument('--show-text', action='store_true', help='With --verbose, also log a preview of each hit\'s text')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse ingested documents and QA pairs whose inputs are unchanged since the last run')
+    args = parser.parse_args()
+
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
     # Load configuration
     cfg = load_config('config/default.yaml')
     
@@ -214,168 +333,188 @@ def main():
     golden_qs_dir = os.path.join(os.path.dirname(__file__), '..', 'golden_qs')
     
     # Ensure directories exist
-    for directory in [data_dir, ingested_dir, og_qa_dir, chunks_dir, golden_qs_dir]:
-        if not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
+    for directory in (data_dir, ingested_dir, og_qa_dir, chunks_dir, golden_qs_dir):
+        os.makedirs(directory, exist_ok=True)
     
-    # Clear directories and Qdrant at the start
+    # Clear directories and Qdrant at the start; incremental runs keep the
+    # ingested documents and QA pairs the manifest says are still current
+    manifest = load_manifest() if args.incremental else {"files": {}, "qa": {}}
     print("Step 0: Clearing directories and Qdrant collection...")
-    clear_directories()
-    clear_qdrant()
+    if args.incremental:
+        for directory in (chunks_dir, golden_qs_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+    else:
+        clear_directories()
+    clear_qdrant(args.user_id)
     
     # First, ingest all files
     print("\nStep 1: Ingesting files...")
-    supported_extensions = {'.pdf', '.md', '.html'}
+    supported_extensions = {'pdf', 'md', 'html'}
     files_to_process = [
-        f for f in os.listdir(data_dir)
-        if os.path.splitext(f)[1].lower() in supported_extensions
+        f for f in list_files(data_dir)
+        if '.' in f and f.rpartition('.')[2].lower() in supported_extensions
     ]
     
     if not files_to_process:
         print("No supported files found in data directory.")
         return
     
-    # Process each file
+    # Ingested documents by doc_id, handed straight to Step 2 rather than
+    # re-read; set keep_in_memory: false for corpora too large to hold
+    keep_in_memory = cfg.get("keep_in_memory", True)
+    ingested_docs = {}
+
+    # Parse files in parallel processes; PDF extraction is CPU-bound and
+    # holds the GIL, and one bad file must not abort the rest
     print(f"Found {len(files_to_process)} files to process:")
-    for filename in files_to_process:
-        file_path = os.path.join(data_dir, filename)
-        print(f"\nProcessing: {filename}")
-        try:
-            ingested_path = ingest_file(file_path)
-            print(f"Successfully ingested to: {ingested_path}")
-        except Exception as e:
-            print(f"Error processing {filename}: {str(e)}")
-            print("Full traceback:")
-            print(traceback.format_exc())
+    with ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1)) as executor:
+        digests = dict(zip(files_to_process, executor.map(
+            file_sha256, [os.path.join(data_dir, filename) for filename in files_to_process]
+        )))
+        # A file is only skipped if its local copy in ingested/ survived too,
+        # since Step 2 reads unchanged documents from there
+        unchanged = {
+            f for f in files_to_process
+            if manifest["files"].get(f) == digests[f]
+            and os.path.exists(os.path.join(ingested_dir, f"{ingested_doc_id(f)}.json"))
+        }
+        if unchanged:
+            print(f"Skipping {len(unchanged)} unchanged files")
+
+        futures = {
+            executor.submit(ingest_file, os.path.join(data_dir, filename), args.user_id): filename
+            for filename in files_to_process
+            if filename not in unchanged
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            print(f"\nProcessed: {filename}")
+            try:
+                ingested_path, doc_data = future.result()
+                doc_id = ingested_doc_id(filename)
+                # Keep a local copy so later --incremental runs can skip this file
+                write_json(os.path.join(ingested_dir, f"{doc_id}.json"), doc_data)
+                if keep_in_memory:
+                    ingested_docs[doc_id] = doc_data
+                manifest["files"][filename] = digests[filename]
+                print(f"Successfully ingested to: {ingested_path}")
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
+                print("Full traceback:")
+                print(traceback.format_exc())
+    save_manifest(manifest)
     
     # Generate QA pairs for each ingested document
     print("\nStep 2: Generating QA pairs...")
-    for filename in os.listdir(ingested_dir):
-        if not filename.endswith('.json'):
+    # Load every ingested document first so QA generation can run concurrently;
+    # only documents not already in memory are read from disk
+    docs = [(doc_id, doc_data['text']) for doc_id, doc_data in ingested_docs.items()]
+    for filename in list_files(ingested_dir, '.json'):
+        doc_id = filename[:-len('.json')]
+        if doc_id in ingested_docs:
             continue
-            
-        doc_id = os.path.splitext(filename)[0]
-        print(f"\nGenerating QA pairs for: {doc_id}")
-        
         try:
-            # Load the ingested document
-            with open(os.path.join(ingested_dir, filename), 'r', encoding='utf-8') as f:
-                doc_data = json.load(f)
-            
-            # Generate QA pairs
-            qa_pairs = generate_queries(doc_id, doc_data['text'], num_qs=4)
+            docs.append((doc_id, read_json(os.path.join(ingested_dir, filename))['text']))
+        except Exception as e:
+            print(f"Error loading ingested document {doc_id}: {str(e)}")
+            print("Full traceback:")
+            print(traceback.format_exc())
+
+    # Documents with saved QA pairs; steps 3-4 reuse this instead of re-listing og_qa
+    doc_ids = []
+    num_qs = 4
+    keys = {doc_id: qa_key(text, num_qs) for doc_id, text in docs}
+    if args.incremental:
+        pending = []
+        for doc_id, text in docs:
+            if manifest["qa"].get(doc_id) == keys[doc_id] and os.path.exists(os.path.join(og_qa_dir, f"{doc_id}_qa.json")):
+                doc_ids.append(doc_id)
+            else:
+                pending.append((doc_id, text))
+        if doc_ids:
+            print(f"Reusing QA pairs for {len(doc_ids)} unchanged documents")
+        docs = pending
+
+    print(f"Generating QA pairs for {len(docs)} documents")
+    qa_lists = asyncio.run(generate_queries_batch(
+        [text for _, text in docs], num_qs, cfg.get("qa_concurrency", 8), return_exceptions=True
+    ))
+
+    for (doc_id, _), qa_pairs in zip(docs, qa_lists):
+        try:
+            if isinstance(qa_pairs, Exception):
+                raise qa_pairs
             
             # Save QA pairs
             output_path = os.path.join(og_qa_dir, f"{doc_id}_qa.json")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(qa_pairs, f, indent=2, ensure_ascii=False)
+            write_json(output_path, qa_pairs, durable=cfg.get("durable", False))
+            manifest["qa"][doc_id] = keys[doc_id]
+            doc_ids.append(doc_id)
             print(f"Saved QA pairs to: {output_path}")
             
         except Exception as e:
             print(f"Error generating QA pairs for {doc_id}: {str(e)}")
             print("Full traceback:")
             print(traceback.format_exc())
+    save_manifest(manifest)
 
-    # Loop through each strategy defined in the config
-    for strategy in cfg["strats"]:
-        print(f"\nRunning pipeline for strategy: {strategy}")
-        
-        # Run chunking with the current strategy
-        print(f"\nStep 3: Running chunking with strategy: {strategy}")
-        print(f"Chunking config: {json.dumps(cfg, indent=2)}")
-        
-        try:
-            # Run run_chunking.py as a subprocess
-            chunking_script = os.path.join(os.path.dirname(__file__), 'run_chunking.py')
-            result = subprocess.run(['python3', chunking_script, '--strategy', strategy], 
-                                  capture_output=True, text=True)
-            
-            # Print the output
-            if result.stdout:
-                print("Chunking stdout:")
-                print(result.stdout)
-            if result.stderr:
-                print("Chunking stderr:")
-                print(result.stderr)
-                
-            if result.returncode == 0:
-                print(f"\nSuccessfully completed chunking with {strategy} strategy")
-            else:
-                print(f"\nError during chunking with {strategy} strategy")
+    strategies = cfg["strats"]
+    print(f"Chunking config: {orjson.dumps(cfg, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()}")
+
+    # Chunking and mapping are independent per strategy, so run them side by
+    # side; embeddings and evaluation share the Qdrant collection and stay
+    # sequential, starting on each strategy as soon as its chunks are ready
+    cpu_count = os.cpu_count() or 1
+    n_parallel = max(1, min(len(strategies), cpu_count))
+    with ProcessPoolExecutor(max_workers=n_parallel) as executor:
+        futures = {
+            executor.submit(run_strategy, strategy, args.user_id, cfg, doc_ids, max(1, cpu_count // n_parallel)): strategy
+            for strategy in strategies
+        }
+        for future in as_completed(futures):
+            strategy = futures[future]
+            print(f"\nRunning pipeline for strategy: {strategy}")
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error during chunking with {strategy} strategy: {str(e)}")
+                print("Full traceback:")
+                print(traceback.format_exc())
                 continue
-                
-        except Exception as e:
-            print(f"Error running chunking script: {str(e)}")
-            print("Full traceback:")
-            print(traceback.format_exc())
-            continue
 
-        # Map answers to chunks and save to golden_qs
-        print("\nStep 4: Mapping answers to chunks...")
-        for filename in os.listdir(og_qa_dir):
-            if not filename.endswith('_qa.json'):
+            # Run embeddings
+            print("\nStep 5: Running embeddings...")
+            try:
+                run_embeddings(strategy, args.user_id, cfg)
+                print("\nSuccessfully completed embeddings")
+            except Exception as e:
+                print(f"Error during embeddings: {str(e)}")
+                print("Full traceback:")
+                print(traceback.format_exc())
                 continue
-                
-            doc_id = filename.replace('_qa.json', '')
-            print(f"\nMapping answers for: {doc_id}")
-            
+
+            # Query the collection with this strategy's golden questions; their
+            # embeddings are cached, so only the first strategy pays for them
             try:
-                # Load the QA pairs
-                with open(os.path.join(og_qa_dir, filename), 'r', encoding='utf-8') as f:
-                    qa_pairs = json.load(f)
-                
-                # Map answers to chunks
-                mapped_answers = map_answers_to_chunks(doc_id, qa_pairs, chunks_dir)
-                
-                # Save mapped answers
-                output_path = os.path.join(golden_qs_dir, f"{doc_id}_golden.json")
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(mapped_answers, f, indent=2, ensure_ascii=False)
-                print(f"Saved mapped answers to: {output_path}")
-                
+                query_golden_questions(cfg, args.user_id, show_text=args.show_text, strategy=strategy)
             except Exception as e:
-                print(f"Error mapping answers for {doc_id}: {str(e)}")
+                print(f"Error querying golden questions: {str(e)}")
                 print("Full traceback:")
                 print(traceback.format_exc())
                 
-        # Run embeddings
-        print("\nStep 5: Running embeddings...")
-        try:
-            embeddings_script = os.path.join(os.path.dirname(__file__), 'run_embeddings.py')
-            result = subprocess.run(['python3', embeddings_script], 
-                                  capture_output=True, text=True)
-            
-            if result.stdout:
-                print("Embeddings stdout:")
-                print(result.stdout)
-            if result.stderr:
-                print("Embeddings stderr:")
-                print(result.stderr)
-                
-            if result.returncode == 0:
-                print("\nSuccessfully completed embeddings")
-            else:
-                print("\nError during embeddings")
+            # Evaluate retrieval performance
+            print("\nStep 7: Evaluating retrieval performance...")
+            try:
+                evaluate_retrieval()
+            except Exception as e:
+                print(f"Error during evaluation: {str(e)}")
+                print("Full traceback:")
+                print(traceback.format_exc())
                 continue
-                
-        except Exception as e:
-            print(f"Error running embeddings script: {str(e)}")
-            print("Full traceback:")
-            print(traceback.format_exc())
-            continue
-            
-        # Evaluate retrieval performance
-        print("\nStep 6: Evaluating retrieval performance...")
-        try:
-            evaluate_retrieval()
-        except Exception as e:
-            print(f"Error during evaluation: {str(e)}")
-            print("Full traceback:")
-            print(traceback.format_exc())
-            continue
 
-        # Clear chunks and golden_qs and Qdrant after evaluation
-        clear_chunks_and_golden_qs_and_qdrant()
+            # Clear this strategy's chunks and golden_qs and Qdrant after evaluation
+            clear_chunks_and_golden_qs_and_qdrant(strategy, args.user_id)
 
 if __name__ == "__main__":
     main()
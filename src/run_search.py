@@ -1,9 +1,17 @@
 import os
+import sys
 import json
+from operator import itemgetter
+import argparse
+import sqlite3
+import orjson
+from hashlib import blake2b
+from functools import lru_cache
 from src.config import load_config
-from src.Embedding import OpenAIEmbedder, HFEmbedder
-from src.vectorStore import search
+from src.embedding import OpenAIEmbedder, HFEmbedder
+from src.vectorStore import search_batch, RESULT_PAYLOAD_FIELDS
 
+@lru_cache(maxsize=1)
 def load_api_keys():
     try:
         with open("APIKeys.json", "r") as f:
@@ -13,7 +21,72 @@ def load_api_keys():
     except json.JSONDecodeError:
         raise ValueError("APIKeys.json is not valid JSON.")
 
+def read_queries(path: str) -> list[str]:
+    """Non-empty lines of ``path``, one query per line."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+# Query embeddings persisted across runs; repeated queries (smoke tests,
+# re-asked questions) skip the embedding call entirely
+QUERY_CACHE_PATH = os.path.join(".cache", "query_embeddings.sqlite")
+
+def _query_key(provider: str, model_name: str, query: str) -> bytes:
+    # The model is part of the key so switching models never returns stale vectors
+    return blake2b(f"{provider}\0{model_name}\0{query}".encode("utf-8"), digest_size=16).digest()
+
+def embed_queries(queries: list[str], embedder, provider: str, model_name: str) -> list[list[float]]:
+    """Embed ``queries``, reusing cached vectors and embedding the rest in one batch."""
+    os.makedirs(os.path.dirname(QUERY_CACHE_PATH), exist_ok=True)
+    keys = [_query_key(provider, model_name, q) for q in queries]
+    with sqlite3.connect(QUERY_CACHE_PATH) as db:
+        db.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key BLOB PRIMARY KEY, vector BLOB)")
+        cached = {}
+        for key in set(keys):
+            row = db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row:
+                cached[key] = orjson.loads(row[0])
+
+        missing = {key: q for key, q in zip(keys, queries) if key not in cached}
+        if missing:
+            vectors = embedder.embed_batch(list(missing.values()))
+            for key, vector in zip(missing, vectors):
+                vector = [float(x) for x in vector]
+                cached[key] = vector
+                db.execute("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?)", (key, orjson.dumps(vector)))
+    return [cached[key] for key in keys]
+
+def run_queries(queries: list[str], embedder, provider: str, model_name: str,
+                collection_name: str, top_k: int, ef_search: int = 128) -> list:
+    """Embed every query in one call and search them in one Qdrant request.
+
+    Returns:
+        One list of hits per query, in the same order
+    """
+    if not queries:
+        return []
+    query_vectors = embed_queries(queries, embedder, provider, model_name)
+    return search_batch(query_vectors, collection_name, limit=top_k,
+                        fields=RESULT_PAYLOAD_FIELDS, hnsw_ef=ef_search)
+
+# search_batch only returns these payload fields (RESULT_PAYLOAD_FIELDS)
+_hit_fields = itemgetter("chunk_id", "source", "strategy")
+
+def format_hits(hits) -> str:
+    """One line per hit: rank, chunk id, source, strategy and score."""
+    rows = []
+    for rank, hit in enumerate(hits, start=1):
+        chunk_id, source, strategy = _hit_fields(
+            {"chunk_id": hit.id, "source": "<unknown>", "strategy": "<unknown>", **(hit.payload or {})}
+        )
+        rows.append(f"{rank:2d}. {chunk_id} (source={source}, strategy={strategy}) → score={hit.score:.4f}")
+    return "\n".join(rows)
+
 def main():
+    parser = argparse.ArgumentParser(description="Search the embedded chunks")
+    parser.add_argument("--queries-file", help="File with one query per line; prompts for a single query if omitted")
+    parser.add_argument("--collection", default="autoembed_chunks", help="Qdrant collection to search")
+    args = parser.parse_args()
+
     # 1) Load configuration
     cfg = load_config("config/default.yaml")
 
@@ -46,28 +119,24 @@ def main():
 
     # 5) Load retrieval parameters
     top_k = cfg.get("objectives", {}).get("retrieval_top_k", 5)
+    ef_search = cfg.get("objectives", {}).get("ef_search", 128)
 
-    # 6) Prompt user for a query
-    query = input("\nEnter a natural-language query: ").strip()
-    if not query:
+    # 6) Read the queries from the file, or prompt for one
+    if args.queries_file:
+        queries = read_queries(args.queries_file)
+    else:
+        query = input("\nEnter a natural-language query: ").strip()
+        queries = [query] if query else []
+    if not queries:
         print("No query provided, exiting.")
         return
 
-    # 7) Embed the query
-    qvec = embedder.embed(query)
-
-    # 8) Perform vector search in Qdrant
-    hits = search(qvec, top_k=top_k)
+    # 7-8) Embed the queries and search Qdrant, one batch each
+    all_hits = run_queries(queries, embedder, provider, model_name, args.collection, top_k, ef_search)
 
     # 9) Display results
-    print(f"\nTop {top_k} results for: '{query}'\n")
-    for rank, hit in enumerate(hits, start=1):
-        payload = hit.payload or {}
-        chunk_id = payload.get("chunk_id", hit.id)
-        source   = payload.get("source", "<unknown>")
-        strategy = payload.get("strategy", "<unknown>")
-        score    = hit.score
-        print(f"{rank:2d}. {chunk_id} (source={source}, strategy={strategy}) → score={score:.4f}")
+    for query, hits in zip(queries, all_hits):
+        sys.stdout.write(f"\nTop {top_k} results for: '{query}'\n\n{format_hits(hits)}\n")
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,55 @@
-import json
+import orjson
+import gzip
+import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import os
 from supabase import create_client, Client
 from typing import List, Dict, Any
 import uuid
+from functools import lru_cache
 import logging
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+# Read .env once at import rather than on every client construction
+load_dotenv()
+
+# Keys per storage remove() call
+REMOVE_BATCH_SIZE = 1000
+
+_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'html': 'text/html',
+    'md': 'text/markdown'
+}
+
+def encode_ndjson_gz(records) -> bytes:
+    """Serialize records as gzip-compressed newline-delimited JSON, one record per line."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=3) as gz:
+        for record in records:
+            gz.write(orjson.dumps(record))
+            gz.write(b"\n")
+    return buf.getvalue()
+
+async def gather_bounded(aws, max_concurrency: int = 16) -> list:
+    """Await ``aws`` concurrently with at most ``max_concurrency`` in flight.
+
+    Returns:
+        The results, in the same order as ``aws``.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
 class SupabaseClient:
     def __init__(self):
-        # Load environment variables
-        load_dotenv()
-        
         # Get Supabase credentials from environment variables
         supabase_url = os.getenv('SUPABASE_URL')
         supabase_key = os.getenv('SUPABASE_KEY')
@@ -43,21 +80,28 @@ class SupabaseClient:
         """Get the storage path for a user's file."""
         return f"users/{user_id}/{file_name}"
     
+    def _upload_path(self, file_path: str, storage_path: str, content_type: str):
+        # Hand the client the open file rather than its bytes: the multipart
+        # body is then streamed from disk in chunks instead of held in memory
+        with open(file_path, 'rb') as f:
+            return self.supabase.storage.from_('documents').upload(
+                storage_path,
+                f,
+                {'content-type': content_type}
+            )
+    
     async def upload_file(self, file_path: str, filename: str, user_id: str) -> dict:
-        """Upload a file to Supabase storage."""
+        """Upload a file to Supabase storage.
+
+        The storage client is blocking, so the read and upload run in a worker
+        thread; several uploads can then be awaited together (see gather_bounded).
+        """
         try:
             logger.info(f"Uploading file {filename} for user {user_id}")
             storage_path = f"users/{user_id}/{filename}"
             logger.info(f"Using storage path: {storage_path}")
             
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            result = self.supabase.storage.from_('documents').upload(
-                storage_path,
-                file_data,
-                {'content-type': self._get_content_type(filename)}
-            )
+            await asyncio.to_thread(self._upload_path, file_path, storage_path, self._get_content_type(filename))
             
             logger.info(f"Successfully uploaded file to {storage_path}")
             return {'success': True, 'path': storage_path}
@@ -67,15 +111,9 @@ class SupabaseClient:
     
     def _get_content_type(self, file_name: str) -> str:
         """Get the content type based on file extension."""
-        ext = file_name.lower().split('.')[-1]
-        content_types = {
-            'pdf': 'application/pdf',
-            'html': 'text/html',
-            'md': 'text/markdown'
-        }
-        return content_types.get(ext, 'application/octet-stream')
+        return _CONTENT_TYPES.get(file_name.rpartition('.')[2].lower(), 'application/octet-stream')
     
-    def list_files(self, user_id: str, prefix: str) -> list:
+    def list_files(self, user_id: str, prefix: str = "users/") -> list:
         """List files for a user in the 'documents' bucket.
         
         Args:
@@ -107,6 +145,59 @@ class SupabaseClient:
             logger.error(f"Error listing files for user {user_id}: {e}")
             raise
     
+    def iter_files(self, user_id: str, prefix: str, page_size: int = 1000):
+        """Yield files for a user page by page instead of materializing the full listing.
+        
+        Args:
+            user_id: The ID of the user whose files to list
+            prefix: Prefix to filter files (e.g., 'users/', 'processed/', 'chunks/', 'qa_pairs/')
+            page_size: Number of entries requested per storage list call
+        
+        Yields:
+            File information dictionaries, as soon as each page arrives
+        """
+        yield from self._iter_path(f"{prefix}{user_id}/", page_size)
+    
+    def _iter_path(self, path: str, page_size: int = 1000):
+        """Yield every entry directly under ``path``, one list call per page."""
+        offset = 0
+        while True:
+            page = self.supabase.storage.from_('documents').list(path, {"limit": page_size, "offset": offset})
+            if not page:
+                return
+            logger.debug(f"Fetched {len(page)} files from {path} at offset {offset}")
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    async def list_all(self, user_id: str, prefix: str, page_size: int = 1000, wave_size: int = 16) -> list:
+        """List every file for a user, requesting pages concurrently.
+
+        The first page is fetched on its own, so a listing that fits in one
+        page costs one request. Only if it comes back full are further pages
+        fetched ``wave_size`` at a time; a short or empty page ends the listing.
+
+        Returns:
+            File information dictionaries, in listing order
+        """
+        path = f"{prefix}{user_id}/"
+        bucket = self.supabase.storage.from_('documents')
+        files = list(await asyncio.to_thread(bucket.list, path, {"limit": page_size, "offset": 0}) or [])
+        offset = page_size
+        while len(files) == offset:
+            pages = await asyncio.gather(*(
+                asyncio.to_thread(bucket.list, path, {"limit": page_size, "offset": offset + i * page_size})
+                for i in range(wave_size)
+            ))
+            for page in pages:
+                files.extend(page or [])
+                if not page or len(page) < page_size:
+                    break
+            offset += wave_size * page_size
+        logger.info(f"Found {len(files)} files in {path}")
+        return files
+    
     def delete_file(self, file_name: str, user_id: str) -> bool:
         """Delete a file from Supabase storage."""
         try:
@@ -117,26 +208,34 @@ class SupabaseClient:
             logger.error(f"Error deleting file: {e}")
             return False
     
-    def clear_all_files(self, user_id: str = None) -> bool:
-        """Delete all files from the documents bucket, optionally for a specific user."""
+    def clear_all_files(self, user_id: str = None, max_workers: int = 8) -> bool:
+        """Delete all files from the documents bucket, optionally for a specific user.
+
+        Every page of the listing is collected (a single list call stops at its
+        page limit), then the keys are removed in batches, several at a time.
+        """
         try:
             if user_id:
                 # Clear only user's files
-                path = f"users/{user_id}"
-                files = self.supabase.storage.from_('documents').list(path)
-                if files:
-                    self.supabase.storage.from_('documents').remove([f['name'] for f in files])
+                folders = [f"users/{user_id}"]
             else:
-                # Clear all files
-                files = self.list_files()
-                if files:
-                    self.supabase.storage.from_('documents').remove([f['name'] for f in files])
+                # Clear all files; the entries directly under users/ are the per-user folders
+                folders = [f"users/{entry['name']}" for entry in self._iter_path("users/")]
+            keys = [f"{folder}/{f['name']}" for folder in folders for f in self._iter_path(f"{folder}/")]
+            if not keys:
+                return True
+
+            bucket = self.supabase.storage.from_('documents')
+            batches = [keys[i:i + REMOVE_BATCH_SIZE] for i in range(0, len(keys), REMOVE_BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(bucket.remove, batches))
+            logger.info(f"Removed {len(keys)} files in {len(batches)} batches")
             return True
         except Exception as e:
             logger.error(f"Error clearing files: {e}")
             return False
     
-    def download_file(self, file_name: str, user_id: str, prefix: str) -> bytes:
+    def download_file(self, file_name: str, user_id: str, prefix: str = "users/") -> bytes:
         """Download a file from Supabase storage."""
         try:
             # Construct the path using the provided prefix
@@ -166,16 +265,16 @@ class SupabaseClient:
             else:
                 data = download_resp
 
-        # 2) Turn it into text
+        # 2) Get the raw body; the JSON parser takes UTF-8 bytes directly
             if isinstance(data, (bytes, bytearray)):
-                text = data.decode("utf-8")
-            elif hasattr(data, "text"):
-                text = data.text
+                body = data
+            elif hasattr(data, "content"):
+                body = data.content
             else:
-                text = data.read().decode("utf-8")
+                body = data.read()
 
         # 3) Parse JSON
-            obj = json.loads(text)
+            obj = orjson.loads(body)
 
         # 4) Drill down into nested keys if needed
             value = obj
@@ -193,6 +292,25 @@ class SupabaseClient:
             logger.error(f"Error fetching field '{field}' from {file_name}: {e}")
             raise
 
+    async def get_json_field_many(
+        self,
+        file_names: List[str],
+        user_id: str,
+        prefix: str,
+        field: str,
+        max_concurrency: int = 32
+    ) -> Dict[str, Any]:
+        """Fetch ``field`` from many JSON files concurrently.
+
+        Returns:
+            A dict mapping each file name to its field value
+        """
+        values = await gather_bounded(
+            (asyncio.to_thread(self.get_json_field, name, user_id, prefix, field) for name in file_names),
+            max_concurrency
+        )
+        return dict(zip(file_names, values))
+
     async def upload_json(
     self,
     file,
@@ -205,15 +323,15 @@ class SupabaseClient:
             storage_path = f"{prefix}/{user_id}/{fname}"
             logger.info(f"Uploading JSON to documents/{storage_path}")
 
-        # 2) Serialize to bytes
-            json_text = json.dumps(file)
-            json_bytes = json_text.encode("utf-8")
+        # 2) Serialize straight to compact UTF-8 bytes
+            json_bytes = orjson.dumps(file)
 
-        # 3) Upload to Supabase Storage
-            result = self.supabase.storage.from_("documents").upload(
+        # 3) Upload to Supabase Storage off the event loop
+            await asyncio.to_thread(
+                self.supabase.storage.from_("documents").upload,
                 storage_path,
                 json_bytes,
-                {"content-type": "application/json"}
+                {"content-type": "application/json", "upsert": "true"}
             )
 
             logger.info(f"Successfully uploaded JSON to {storage_path}")
@@ -223,7 +341,56 @@ class SupabaseClient:
             logger.error(f"Exception uploading JSON file {fname}: {e}")
             return {"success": False, "error": str(e)}
 
+    async def upload_ndjson_gz(
+        self,
+        records,
+        fname: str,
+        user_id: str,
+        prefix: str
+    ) -> dict:
+        """Upload records as gzip-compressed newline-delimited JSON, one record per line."""
+        try:
+            payload = encode_ndjson_gz(records)
+            storage_path = await asyncio.to_thread(self.put_ndjson_gz, payload, fname, user_id, prefix)
+            return {"success": True, "path": storage_path}
+
+        except Exception as e:
+            logger.error(f"Exception uploading NDJSON file {fname}: {e}")
+            return {"success": False, "error": str(e)}
+
+    def put_ndjson_gz(self, payload: bytes, fname: str, user_id: str, prefix: str) -> str:
+        """Upload an already encoded ``encode_ndjson_gz`` payload and return its storage path."""
+        storage_path = f"{prefix}/{user_id}/{fname}"
+        logger.info(f"Uploading NDJSON to documents/{storage_path}")
+
+        # No content-encoding header: the object is stored and served as
+        # gzip bytes, and readers detect the gzip magic number themselves.
+        # Re-runs replace the previous run's file rather than conflicting with it
+        self.supabase.storage.from_("documents").upload(
+            storage_path,
+            payload,
+            {"content-type": "application/x-ndjson", "upsert": "true"}
+        )
+
+        logger.info(f"Successfully uploaded NDJSON to {storage_path}")
+        return storage_path
+
+    def iter_ndjson(self, fname: str, user_id: str, prefix: str):
+        """Yield the records of an NDJSON file (gzip-compressed or not) one at a time."""
+        storage_path = f"{prefix}/{user_id}/{fname}"
+        raw = self.download_file(fname, user_id, prefix)
+        if raw is None:
+            raise FileNotFoundError(f"No object at {storage_path}")
+
+        lines = gzip.GzipFile(fileobj=io.BytesIO(raw)) if raw[:2] == b"\x1f\x8b" else io.BytesIO(raw)
+        with lines:
+            for line in lines:
+                if line.strip():
+                    yield orjson.loads(line)
+
     def fetch_json_list(self, fname: str, user_id: str, prefix: str) -> list[dict]:
+        if fname.endswith((".ndjson", ".ndjson.gz")):
+            return list(self.iter_ndjson(fname, user_id, prefix))
         try:
             # 1) download raw bytes
             storage_path = f"{prefix}/{user_id}/{fname}"
@@ -231,15 +398,45 @@ class SupabaseClient:
             if raw is None:
                 raise FileNotFoundError(f"No object at {storage_path}")
             
-            # 2) decode to str
-            text = raw.decode("utf-8")
-            
-            # 3) parse JSON
-            data = json.loads(text)
+            # 2) parse JSON straight from the UTF-8 bytes
+            data = orjson.loads(raw)
             if not isinstance(data, list):
                 raise ValueError(f"Expected a JSON list, got {type(data)}")
             return data
         
         except Exception as e:
             logging.error(f"Error fetching JSON list from {storage_path}: {e}")
-            raise
\ No newline at end of file
+            raise
+    async def fetch_json_lists(
+        self,
+        fnames: List[str],
+        user_id: str,
+        prefix: str,
+        max_concurrency: int = 16
+    ) -> List[list[dict]]:
+        """Fetch several JSON list files concurrently.
+
+        Downloads are network-bound, so each ``fetch_json_list`` call runs in a
+        worker thread with at most ``max_concurrency`` requests in flight.
+
+        Returns:
+            The parsed lists, in the same order as ``fnames``.
+        """
+        return await gather_bounded(
+            (asyncio.to_thread(self.fetch_json_list, fname, user_id, prefix) for fname in fnames),
+            max_concurrency
+        )
+
+
+@lru_cache(maxsize=1)
+def _client_for_process(pid: int) -> SupabaseClient:
+    return SupabaseClient()
+
+def get_supabase_client() -> SupabaseClient:
+    """Shared SupabaseClient for the current process.
+
+    Building a client reloads the environment and sets up a new connection
+    pool, so callers reuse this one. It is keyed on the pid because a forked
+    worker must not share the parent's open connections.
+    """
+    return _client_for_process(os.getpid())
@@ -1,25 +1,57 @@
+import os
 import tiktoken
+from functools import lru_cache
 from transformers import AutoTokenizer
 
-def get_tokenizer(model_name: str, provider: str):
-    if provider.lower() == "huggingface":
-        return AutoTokenizer.from_pretrained(model_name)
-    elif provider.lower() == "openai":
+# Loading a tokenizer (vocab/merges files) is far costlier than using it, and
+# every chunker asks for the same one per document; keep one per model.
+@lru_cache(maxsize=32)
+def _load_tokenizer(model_name: str, provider: str):
+    if provider == "huggingface":
+        # The Rust-backed "fast" tokenizer where the model provides one
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    elif provider == "openai":
         return tiktoken.encoding_for_model(model_name)
     else:
         raise ValueError(f"Unknown provider: {provider}")
+
+def get_tokenizer(model_name: str, provider: str):
+    # Normalize before the cache so "OpenAI" and "openai" share an entry
+    return _load_tokenizer(model_name, provider.lower())
     
 def count_tokens(text: str, tokenizer, provider: str) -> int:
     if provider.lower() == "huggingface":
         tokens = tokenizer.encode(text, add_special_tokens=False)
         return len(tokens)
     elif provider.lower() == "openai":
-        tokens = tokenizer.encode(text)
+        # Counting plain text: skip the special-token scan encode() does
+        tokens = tokenizer.encode_ordinary(text)
         return len(tokens)
     else:
         raise ValueError(f"Unknown provider: {provider}")
     
+def count_tokens_batch(texts: list[str], tokenizer, provider: str) -> list[int]:
+    """Token counts for many texts in one call.
+
+    Both the HF fast tokenizers and tiktoken encode a batch in native code
+    across threads, which avoids the per-text Python overhead of count_tokens.
+    """
+    if not texts:
+        return []
+    provider = provider.lower()
+    if provider == "huggingface":
+        return tokenizer(texts, add_special_tokens=False, return_length=True,
+                         padding=False, truncation=False)["length"]
+    elif provider == "openai":
+        return [len(tokens) for tokens in tokenizer.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)]
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+
 def get_token_counts(text: str, provider: str, model_name: str) -> int:
     tokenizer = get_tokenizer(model_name, provider)
     token_counts = count_tokens(text, tokenizer, provider)
     return token_counts
+
+def get_token_counts_batch(texts: list[str], provider: str, model_name: str) -> list[int]:
+    tokenizer = get_tokenizer(model_name, provider)
+    return count_tokens_batch(texts, tokenizer, provider)
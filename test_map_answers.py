@@ -0,0 +1,86 @@
+import random
+import string
+
+import pytest
+
+from src import querier
+from src.querier import compact, map_answers_to_chunks, normalize
+
+
+def scan_map(qa_pairs, chunks_list, strategy):
+    """The original linear scan: the first chunk, then adjacent pairs (fixed_token) or single chunks."""
+    texts = [compact(normalize(chunk['text'])) for chunk in chunks_list]
+    mapped = []
+    for qa in qa_pairs:
+        ans = compact(normalize(qa['answer'] or ""))
+        # Answers that normalize to nothing cannot identify a chunk
+        if not ans:
+            continue
+        if ans in texts[0]:
+            gold = 0
+        elif strategy == "fixed_token":
+            gold = next((i + 1 for i in range(len(texts) - 1) if ans in texts[i] + texts[i + 1]), None)
+        else:
+            gold = next((i for i, text in enumerate(texts) if ans in text), None)
+        if gold is not None:
+            mapped.append({'question': qa['question'], 'gold_chunk_id': chunks_list[gold]['id']})
+    return mapped
+
+
+@pytest.fixture(params=["automaton", "index"])
+def matcher(request, monkeypatch):
+    if request.param == "automaton":
+        monkeypatch.setattr(querier, "ahocorasick", pytest.importorskip("ahocorasick"))
+    else:
+        monkeypatch.setattr(querier, "ahocorasick", None)
+    return request.param
+
+
+CHUNKS = [
+    {'id': 'c1', 'text': 'The quick brown fox'},
+    {'id': 'c2', 'text': 'jumps over the lazy'},
+    {'id': 'c3', 'text': 'dog, twice!'},
+]
+
+
+@pytest.mark.parametrize("strategy", ["fixed_token", "sliding_window"])
+@pytest.mark.parametrize("answers", [
+    [],
+    [""],
+    [None, ""],
+    ["!!", "...", " - "],
+])
+def test_no_usable_answers(matcher, strategy, answers):
+    qa_pairs = [{'question': f"q{i}", 'answer': answer} for i, answer in enumerate(answers)]
+    assert map_answers_to_chunks(qa_pairs, CHUNKS, strategy) == []
+
+
+@pytest.mark.parametrize("strategy", ["fixed_token", "sliding_window"])
+def test_mixed_answers(matcher, strategy):
+    qa_pairs = [
+        {'question': "q0", 'answer': "?!"},
+        {'question': "q1", 'answer': "Lazy dog"},
+        {'question': "q2", 'answer': "QUICK brown"},
+        {'question': "q3", 'answer': "not in the text"},
+        {'question': "q4", 'answer': "twice"},
+    ]
+    assert map_answers_to_chunks(qa_pairs, CHUNKS, strategy) == scan_map(qa_pairs, CHUNKS, strategy)
+
+
+@pytest.mark.parametrize("strategy", ["fixed_token", "sliding_window", "sentence_aware"])
+def test_matches_scan_on_random_text(matcher, strategy):
+    rng = random.Random(0)
+    alphabet = "ab c." + string.ascii_uppercase[:2]
+    for _ in range(200):
+        chunks = [
+            {'id': f"c{i}", 'text': "".join(rng.choices(alphabet, k=rng.randint(1, 12)))}
+            for i in range(rng.randint(1, 6))
+        ]
+        full = "".join(chunk['text'] for chunk in chunks)
+        qa_pairs = []
+        for i in range(rng.randint(0, 6)):
+            start = rng.randrange(len(full))
+            answer = full[start:start + rng.randint(0, 10)] if rng.random() < 0.7 \
+                else "".join(rng.choices(alphabet, k=rng.randint(0, 5)))
+            qa_pairs.append({'question': f"q{i}", 'answer': answer})
+        assert map_answers_to_chunks(qa_pairs, chunks, strategy) == scan_map(qa_pairs, chunks, strategy)
@@ -6,6 +6,7 @@ import logging
 import sys
 import asyncio
 import uuid
+from itertools import chain
 import supabase
 import spacy
 
@@ -13,10 +14,10 @@ import spacy
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.ingest import ingest_all_files
-from src.supabase_client import SupabaseClient
-from src.querier import generate_queries
+from src.supabase_client import get_supabase_client, gather_bounded
+from src.querier import generate_queries_batch
 from src.config import load_config
-from src.run_chunking import chunk_text
+from src.run_chunking import chunk_documents
 from src.querier import map_answers_to_chunks
 from src.run_embeddings import run_embeddings
 from src.evaluate_retrieval import evaluate_retrieval
@@ -38,7 +39,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Initialize Supabase client
-supabase_client = SupabaseClient()
+supabase_client = get_supabase_client()
 
 # Configure upload settings
 ALLOWED_EXTENSIONS = {'pdf', 'md', 'html'}
@@ -73,6 +74,8 @@ async def upload_files():
         uploaded_files = []
         errors = []
         
+        # Save every upload to a temp file first, then push them to Supabase concurrently
+        saved = []
         for file in files:
             logger.debug(f"Processing file: {file.filename}")
             if file and allowed_file(file.filename):
@@ -87,35 +90,35 @@ async def upload_files():
                     logger.error(f"Error saving temporary file: {str(save_error)}")
                     errors.append(f"Failed to save {filename}: {str(save_error)}")
                     continue
-                
-                # Upload to Supabase
-                logger.debug(f"Attempting to upload to Supabase: {filename}")
-                try:
-                    result = await supabase_client.upload_file(temp_path, filename, user_id)
-                    logger.debug(f"Supabase upload result: {result}")
-                    
-                    # Clean up temp file
-                    try:
-                        os.remove(temp_path)
-                        logger.debug(f"Successfully removed temporary file")
-                    except Exception as cleanup_error:
-                        logger.warning(f"Failed to remove temporary file: {str(cleanup_error)}")
-                    
-                    if result['success']:
-                        uploaded_files.append(filename)
-                        logger.info(f"Successfully uploaded {filename} to Supabase")
-                    else:
-                        error_msg = f"Failed to upload to Supabase: {result.get('error', 'Unknown error')}"
-                        logger.error(error_msg)
-                        errors.append(error_msg)
-                except Exception as upload_error:
-                    logger.error(f"Error during Supabase upload: {str(upload_error)}")
-                    errors.append(f"Failed to upload {filename}: {str(upload_error)}")
+                saved.append((filename, temp_path))
             else:
                 error_msg = f"Invalid file type: {file.filename}"
                 logger.error(error_msg)
                 errors.append(error_msg)
         
+        # Upload to Supabase
+        logger.debug(f"Attempting to upload {len(saved)} files to Supabase")
+        results = await gather_bounded(
+            supabase_client.upload_file(temp_path, filename, user_id) for filename, temp_path in saved
+        )
+        for (filename, temp_path), result in zip(saved, results):
+            logger.debug(f"Supabase upload result: {result}")
+            
+            # Clean up temp file
+            try:
+                os.remove(temp_path)
+                logger.debug(f"Successfully removed temporary file")
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to remove temporary file: {str(cleanup_error)}")
+            
+            if result['success']:
+                uploaded_files.append(filename)
+                logger.info(f"Successfully uploaded {filename} to Supabase")
+            else:
+                error_msg = f"Failed to upload to Supabase: {result.get('error', 'Unknown error')}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+        
         response = {
             'success': len(uploaded_files),
             'uploaded_files': uploaded_files,
@@ -133,7 +136,7 @@ async def upload_files():
 def check_files():
     try:
         user_id = get_user_id()
-        files = supabase_client.list_files(user_id, prefix="users/")
+        files = list(supabase_client.iter_files(user_id, prefix="users/"))
         logger.info(f"Found {len(files)} files in Supabase storage for user {user_id}")
         return jsonify({
             'hasFiles': len(files) > 0,
@@ -203,18 +206,23 @@ async def process_documents():
         try:
             logger.info("Step 2: Generating QA pairs...")
             
-            files = supabase_client.list_files(user_id, prefix="processed/")
-            for file in files:
-                fname = file['name']
-                text = supabase_client.get_json_field(fname, user_id, "processed/", "text")
-                curr = generate_queries(text)
+            files = await supabase_client.list_all(user_id, prefix="processed/")
+            doc_texts = await supabase_client.get_json_field_many(
+                [file['name'] for file in files], user_id, "processed/", "text"
+            )
+            for fname, text in doc_texts.items():
                 dict = {
                     "source": fname.rstrip('.json'),
                     "text": text,
                 }
                 texts.append(dict)
-                name_clean = fname.rstrip('.json')
-                await supabase_client.upload_json(curr, f"{name_clean}_qa.json", user_id, "qa_pairs")
+
+            # Generate QA pairs for every document concurrently
+            qa_lists = await generate_queries_batch([t['text'] for t in texts])
+            await gather_bounded(
+                supabase_client.upload_json(curr, f"{doc['source']}_qa.json", user_id, "qa_pairs")
+                for doc, curr in zip(texts, qa_lists)
+            )
 
         except Exception as qa_error:
             logger.error(f"Error during QA generation: {str(qa_error)}", exc_info=True)
@@ -224,20 +232,34 @@ async def process_documents():
             }), 500
         
         output_dict = {}
-        # Step 3: Chunk documents (ADD CHUNKING LOGIC HERE)
+        provider = config['embedding'][0]
+        model = config[provider][0]['model']
+
+        # Step 3: Chunk every document with every strategy in parallel processes
+        try:
+            logger.info("Step 3: Chunking documents...")
+            chunked = await asyncio.to_thread(
+                chunk_documents,
+                [(text['source'], text['text']) for text in texts],
+                config['strats'], model, provider, config
+            )
+        except Exception as chunk_error:
+            logger.error(f"Error during chunking: {str(chunk_error)}", exc_info=True)
+            return jsonify({
+                'error': 'Error during chunking',
+                'details': str(chunk_error)
+            }), 500
+
         for strategy in config['strats']:
             chunks_to_embed = []
-            provider = config['embedding'][0]
-            model = config[provider][0]['model']
             logger.info(f"Chunking with strategy: {strategy}, provider: {provider}, model: {model}")
             
             try:
-                logger.info("Step 3: Chunking documents...")
-                for text in texts:
-                    chunk_dict = chunk_text(text['text'], strategy, text['source'], model, provider, config)
-                    chunks_to_embed.append(chunk_dict)
-                    await supabase_client.upload_json(chunk_dict, f"{text['source']}_chunks.json", user_id, f"chunks/{strategy}")
-                pass
+                chunks_to_embed = chunked[strategy]
+                await gather_bounded(
+                    supabase_client.upload_ndjson_gz(chunk_dict, f"{text['source']}_chunks.ndjson.gz", user_id, f"chunks/{strategy}")
+                    for text, chunk_dict in zip(texts, chunks_to_embed)
+                )
             except Exception as chunk_error:
                 logger.error(f"Error during chunking: {str(chunk_error)}", exc_info=True)
                 return jsonify({
@@ -249,12 +271,13 @@ async def process_documents():
             # Step 4: add golden qs
             golden_dict = {}
             try:
-                chunk_files = supabase_client.list_files(user_id, prefix=f"chunks/{strategy}/")
+                chunk_files = await supabase_client.list_all(user_id, prefix=f"chunks/{strategy}/")
+                chunk_names = [f['name'] for f in chunk_files]
+                chunk_lists = await supabase_client.fetch_json_lists(chunk_names, user_id, f"chunks/{strategy}/")
                 chunks_dict = {}
-                for f in chunk_files:
-                    chunk_list = supabase_client.fetch_json_list(f['name'], user_id, f"chunks/{strategy}/")
-                    logger.info(f"Chunk file fname first named: {f['name']}")
-                    fname = f['name'].rstrip('_chunks.json')
+                for name, chunk_list in zip(chunk_names, chunk_lists):
+                    logger.info(f"Chunk file fname first named: {name}")
+                    fname = name.removesuffix('_chunks.ndjson.gz')
                     chunks = []
                     for chunk in chunk_list:
                         inner_map = {"text": chunk['text'], "id": chunk['chunk_id']}
@@ -262,14 +285,16 @@ async def process_documents():
                     chunks_dict[fname] = chunks
                     logger.info(f"Chunk file fname after strip: {fname}")
                 
-                qa_files = supabase_client.list_files(user_id, prefix="qa_pairs/")
-                for f in qa_files:
-                    qa_list = supabase_client.fetch_json_list(f['name'], user_id, "qa_pairs/")
-                    fname = f['name'].rstrip('_qa.json')
+                qa_files = await supabase_client.list_all(user_id, prefix="qa_pairs/")
+                qa_names = [f['name'] for f in qa_files]
+                qa_lists = await supabase_client.fetch_json_lists(qa_names, user_id, "qa_pairs/")
+                golden_uploads = []
+                for name, qa_list in zip(qa_names, qa_lists):
+                    fname = name.removesuffix('_qa.json')
                     logger.info(f"QA file fname after strip: {fname}")
                     golden_dict = map_answers_to_chunks(qa_list, chunks_dict[fname], strategy)
-                    await supabase_client.upload_json(golden_dict, f"{fname}_golden.json", user_id, f"golden/{strategy}")
-                pass
+                    golden_uploads.append(supabase_client.upload_json(golden_dict, f"{fname}_golden.json", user_id, f"golden/{strategy}"))
+                await gather_bounded(golden_uploads)
 
             except Exception as golden_error:
                 logger.error(f"Error during golden qs: {str(golden_error)}", exc_info=True)
@@ -281,8 +306,8 @@ async def process_documents():
             #Step 5 Embedding Steps
             try:
                 #todo
-                for embed_chunk in chunks_to_embed:
-                    run_embeddings(embed_chunk, user_id)
+                # One stream across all documents so batches fill up regardless of document size
+                run_embeddings(chain.from_iterable(chunks_to_embed), user_id, config.get('embed_max_workers', 16))
                 pass
             except Exception as embedding_error:
                 logger.error(f"Error during embedding: {str(embedding_error)}", exc_info=True)